@@ -0,0 +1,65 @@
+"""Admission control for expensive commands under overload.
+
+Load is the highest of three ratios: playground requests in flight, requests
+queued for a playground slot and event loop lag, each against its limit.
+Every priority class has its own load ceiling, so everyone else is shed
+first, then authorized roles, while the owner is never shed.
+"""
+
+import enum
+import math
+import typing
+import loopmonitor
+import vplayground
+
+
+class Priority(enum.IntEnum):
+    EVERYONE = 0
+    AUTHORIZED = 1
+    OWNER = 2
+
+
+# load above which a class is turned away, None means never
+CEILINGS: dict[Priority, typing.Optional[float]] = {
+    Priority.EVERYONE: 1.0,
+    Priority.AUTHORIZED: 1.5,
+    Priority.OWNER: None,
+}
+
+
+class Admission:
+    def __init__(
+        self,
+        v: vplayground.V,
+        monitor: loopmonitor.LoopMonitor,
+        *,
+        max_in_flight: int = 16,
+        max_waiting: int = 16,
+        max_lag: float = 0.5,
+        retry_after: float = 5.0,
+    ) -> None:
+        self.v = v
+        self.monitor = monitor
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.max_lag = max_lag
+        self.retry_after = retry_after
+        self.shed = {priority: 0 for priority in Priority}
+
+    @property
+    def load(self) -> float:
+        return max(
+            self.v.in_flight / self.max_in_flight,
+            self.v.waiting / self.max_waiting,
+            self.monitor.lag / self.max_lag,
+        )
+
+    def check(self, priority: Priority) -> typing.Optional[int]:
+        """Return seconds to retry after if the request should be shed."""
+        ceiling = CEILINGS[priority]
+        load = self.load
+        if ceiling is None or load < ceiling:
+            return None
+        self.shed[priority] += 1
+        # the further past the ceiling, the longer the backlog takes to drain
+        return math.ceil(self.retry_after * load / ceiling)
@@ -1,42 +1,45 @@
 # requires discord.py v2.4
 
+import startup  # first, so that the other imports are timed
+
+import admission
 import aiohttp
 import asyncio
+import cache
+import cgen
 import dataclasses
 import discord
 from discord import app_commands
 from discord.ext import commands
+import docstore
+import functools
+import hashlib
 import json
-import os
+import loopmonitor
 import io
 from os.path import join
+import preflight
 import re
+import recording
+import shutil
+import symspell
 import sys
-import traceback
+import time
+import tracing
 import typing
 import vplayground
 
-with open("config.json", "r") as file:
-    config = json.load(file)
-
+if typing.TYPE_CHECKING:
+    import profiler
 
-def load_docs() -> dict[str, typing.Any]:
-    docs = {}
-    for module in os.listdir(join("docs", "_docs")):
-        if not module.endswith(".json"):
-            continue
-        module_name = module[:-5]
-        try:
-            with open(join("docs", "_docs", module), "r") as doc:
-                docs[module_name] = json.load(doc)
-        except Exception as exc:
-            print(f"[vlib:{module_name}] Loading failed")
-            traceback.print_exception(exc)
-    return docs
+T = typing.TypeVar("T", bound=typing.Callable[..., typing.Any])
+R = typing.TypeVar("R")
 
+timeline = startup.Timeline()
+timeline.record("imports", startup.STARTED)
 
-with open("headers.json", "r") as file:
-    headers = json.load(file)
+with timeline.phase("config"), open("config.json", "r") as file:
+    config = json.load(file)
 
 
 def levenshtein(x: str, y: str) -> int:
@@ -61,6 +64,151 @@ def levenshtein(x: str, y: str) -> int:
     return d[-1][-1]
 
 
+@functools.cache
+def header_index() -> symspell.SymSpell:
+    """Index over ``headers.json``, built on first use."""
+    with timeline.phase("headers"), open("headers.json", "r") as file:
+        return symspell.SymSpell(json.load(file), levenshtein)
+
+
+def traced(name: str) -> typing.Callable[[T], T]:
+    """Run the wrapped handler inside a root span.
+
+    The span records how long the message or interaction waited before the
+    handler started running.
+    """
+
+    def decorator(func: T) -> T:
+        @functools.wraps(func)
+        async def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            with tracing.span(name) as span:
+                if span is not None:
+                    for arg in args:
+                        if isinstance(arg, commands.Context):
+                            created_at = arg.message.created_at
+                        elif isinstance(arg, discord.Interaction):
+                            created_at = arg.created_at
+                        else:
+                            continue
+                        span.set(
+                            "delay_ms",
+                            (discord.utils.utcnow() - created_at).total_seconds()
+                            * 1000,
+                        )
+                        break
+                return await func(*args, **kwargs)
+
+        return typing.cast(T, wrapper)
+
+    return decorator
+
+
+def recorded(
+    kind: str, payload: typing.Callable[..., typing.Any]
+) -> typing.Callable[[T], T]:
+    """Record the invocation for ``replay.py`` when recording is enabled.
+
+    ``payload`` is called with the handler's arguments and returns what
+    :func:`loadtest.invoke` takes to run it again as ``kind``. Apply it below
+    :func:`admitted`, so requests turned away for load are not recorded as if
+    they had been handled.
+    """
+
+    def decorator(func: T) -> T:
+        @functools.wraps(func)
+        async def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            with recording.record(kind, lambda: payload(*args, **kwargs)):
+                return await func(*args, **kwargs)
+
+        return typing.cast(T, wrapper)
+
+    return decorator
+
+
+async def priority(bot: "Bot", user: discord.abc.User) -> admission.Priority:
+    if await bot.is_owner(user):
+        return admission.Priority.OWNER
+    authorized = config.get("authorized_roles", [])
+    for role in getattr(user, "roles", []):
+        if str(role.id) in authorized:
+            return admission.Priority.AUTHORIZED
+    return admission.Priority.EVERYONE
+
+
+def admitted(func: T) -> T:
+    """Turn the request away with a retry hint when the bot is overloaded."""
+
+    @functools.wraps(func)
+    async def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        for arg in args:
+            if isinstance(arg, commands.Context):
+                bot, user = arg.bot, arg.author
+                reply = arg.send
+            elif isinstance(arg, discord.Interaction):
+                bot, user = arg.client, arg.user
+                reply = functools.partial(arg.response.send_message, ephemeral=True)
+            else:
+                continue
+            retry_after = bot.admission.check(await priority(bot, user))
+            if retry_after is not None:
+                await reply(f"Busy, retry in {retry_after}s.")
+                return None
+            break
+        return await func(*args, **kwargs)
+
+    return typing.cast(T, wrapper)
+
+
+async def respond(
+    interaction: discord.Interaction["Bot"], *args: typing.Any, **kwargs: typing.Any
+) -> None:
+    with tracing.span("discord.respond"):
+        await interaction.response.send_message(*args, **kwargs)
+    timeline.mark_reply()
+
+
+CODE_BLOCK = re.compile(r"```[\w+-]*\n(.*?)```", re.DOTALL)
+
+
+def extract_code_blocks(code: str) -> list[str]:
+    return [block.rstrip("\n") for block in CODE_BLOCK.findall(code)]
+
+
+async def run_snippets(
+    v: vplayground.V, snippets: list[str], **kwargs: typing.Any
+) -> tuple[str, list[discord.File]]:
+    """Run several snippets concurrently and render one consolidated reply.
+
+    Returns the message content and, when the content would not fit in a
+    message, one file per snippet instead.
+    """
+    limit = config.get("max_snippets", 4)
+    results = await v.run_many(snippets[:limit], **kwargs)
+    parts = []
+    files = []
+    for i, result in enumerate(results, 1):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            text, filename = f"Request failed: {result}", f"error_{i}.rs"
+        elif result.error != "":
+            text, filename = result.error, f"error_{i}.rs"
+        elif result.output == "":
+            text, filename = "No output was produced.", f"output_{i}.rs"
+        else:
+            text, filename = result.output, f"output_{i}.rs"
+        parts.append(f"**Snippet {i}**\n```rs\n{text}\n```")
+        files.append(discord.File(io.BytesIO(text.encode("utf_8")), filename))
+    content = "\n".join(parts)
+    if len(snippets) > limit:
+        note = f"Only the first {limit} code blocks were evaluated."
+    else:
+        note = ""
+    if len(content) + len(note) >= 1990:
+        return (note or f"Results of {len(results)} snippets are attached."), files
+    return (f"{note}\n{content}" if note else content), []
+
+
 class EvalModal(discord.ui.Modal, title="Evaluate V code"):
     code = discord.ui.TextInput(
         label="Code", style=discord.TextStyle.paragraph, custom_id="code"
@@ -75,9 +223,39 @@ class EvalModal(discord.ui.Modal, title="Evaluate V code"):
         label="Run arguments", custom_id="run_arguments", required=False, max_length=100
     )
 
+    @traced("modal.eval")
+    @admitted
+    @recorded(
+        "modal_eval",
+        lambda self, interaction: {
+            "code": self.code.value,
+            "build_arguments": self.build_arguments.value,
+            "run_arguments": self.run_arguments.value,
+        },
+    )
     async def on_submit(self, interaction: discord.Interaction["Bot"]) -> None:
         build_arguments = self.build_arguments.value
         run_arguments = self.run_arguments.value
+        snippets = extract_code_blocks(self.code.value)
+        if len(snippets) > 1:
+            embed = discord.Embed(color=0x4287F5, title="Evaluated snippets")
+            if build_arguments != "":
+                embed.add_field(name="Build arguments", value=build_arguments)
+            if run_arguments != "":
+                embed.add_field(name="Run arguments", value=run_arguments)
+            content, files = await run_snippets(
+                interaction.client.v,
+                snippets,
+                build_arguments=build_arguments,
+                run_arguments=run_arguments,
+            )
+            return await respond(
+                interaction,
+                content,
+                files=files or discord.utils.MISSING,
+                embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
+                view=DeleteButtonView(interaction.user.id),
+            )
         response = await interaction.client.v.run(
             self.code.value,
             build_arguments=build_arguments,
@@ -93,14 +271,16 @@ class EvalModal(discord.ui.Modal, title="Evaluate V code"):
             if run_arguments != "":
                 embed.add_field(name="Run arguments", value=run_arguments)
             if len(response.error) >= 1989:
-                return await interaction.response.send_message(
+                return await respond(
+                    interaction,
                     file=discord.File(
                         io.BytesIO(response.error.encode("utf_8")), "error.rs"
                     ),
                     embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
                     view=DeleteButtonView(interaction.user.id),
                 )
-            return await interaction.response.send_message(
+            return await respond(
+                interaction,
                 f"```rs\n{response.error}\n```",
                 embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
                 view=DeleteButtonView(interaction.user.id),
@@ -114,7 +294,8 @@ class EvalModal(discord.ui.Modal, title="Evaluate V code"):
         if run_arguments != "":
             embed.add_field(name="Run arguments", value=run_arguments)
         if len(response.output) >= 1989:
-            return await interaction.response.send_message(
+            return await respond(
+                interaction,
                 file=discord.File(
                     io.BytesIO(response.output.encode("utf_8")), "output.rs"
                 ),
@@ -122,16 +303,31 @@ class EvalModal(discord.ui.Modal, title="Evaluate V code"):
                 view=DeleteButtonView(interaction.user.id),
             )
         if response.output == "":
-            return await interaction.response.send_message(
-                "No output was produced.", view=DeleteButtonView(interaction.user.id)
+            return await respond(
+                interaction,
+                "No output was produced.",
+                view=DeleteButtonView(interaction.user.id),
             )
-        return await interaction.response.send_message(
+        return await respond(
+            interaction,
             f"```rs\n{response.output}\n```",
             embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
             view=DeleteButtonView(interaction.user.id),
         )
 
 
+async def trim_cgen(code: str, *, full: bool = False, callees: bool = False) -> str:
+    """Keep only the user's declarations unless the full file was requested."""
+    if full:
+        return code
+    # the scan is linear in the file size, keep it off the event loop
+    with tracing.span("cgen.trim", size=len(code)):
+        trimmed = await asyncio.to_thread(cgen.trim, code, callees=callees)
+    if trimmed == "":
+        return code
+    return trimmed
+
+
 class CgenModal(discord.ui.Modal, title="Show cgen output from V code"):
     code = discord.ui.TextInput(
         label="Code", style=discord.TextStyle.paragraph, custom_id="code"
@@ -143,6 +339,24 @@ class CgenModal(discord.ui.Modal, title="Show cgen output from V code"):
         max_length=100,
     )
 
+    def __init__(
+        self, *, full: bool = False, callees: bool = False, **kwargs: typing.Any
+    ) -> None:
+        super().__init__(**kwargs)
+        self.full = full
+        self.callees = callees
+
+    @traced("modal.cgen")
+    @admitted
+    @recorded(
+        "modal_cgen",
+        lambda self, interaction: {
+            "code": self.code.value,
+            "build_arguments": self.build_arguments.value,
+            "full": self.full,
+            "callees": self.callees,
+        },
+    )
     async def on_submit(self, interaction: discord.Interaction["Bot"]) -> None:
         build_arguments = self.build_arguments.value
         response = await interaction.client.v.cgen(
@@ -156,14 +370,16 @@ class CgenModal(discord.ui.Modal, title="Show cgen output from V code"):
             if build_arguments != "":
                 embed.add_field(name="Build arguments", value=build_arguments)
             if len(response.error) >= 1989:
-                return await interaction.response.send_message(
+                return await respond(
+                    interaction,
                     file=discord.File(
                         io.BytesIO(response.error.encode("utf_8")), "error.rs"
                     ),
                     embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
                     view=DeleteButtonView(interaction.user.id),
                 )
-            return await interaction.response.send_message(
+            return await respond(
+                interaction,
                 f"```rs\n{response.error}\n```",
                 embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
                 view=DeleteButtonView(interaction.user.id),
@@ -174,16 +390,19 @@ class CgenModal(discord.ui.Modal, title="Show cgen output from V code"):
         )
         if build_arguments != "":
             embed.add_field(name="Build arguments", value=build_arguments)
-        if len(response.cgen_code) >= 1990:
-            return await interaction.response.send_message(
-                file=discord.File(
-                    io.BytesIO(response.cgen_code.encode("utf_8")), "output.c"
-                ),
+        cgen_code = await trim_cgen(
+            response.cgen_code, full=self.full, callees=self.callees
+        )
+        if len(cgen_code) >= 1990:
+            return await respond(
+                interaction,
+                file=discord.File(io.BytesIO(cgen_code.encode("utf_8")), "output.c"),
                 embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
                 view=DeleteButtonView(interaction.user.id),
             )
-        return await interaction.response.send_message(
-            f"```c\n{response.cgen_code}\n```",
+        return await respond(
+            interaction,
+            f"```c\n{cgen_code}\n```",
             embed=embed if len(embed.fields) > 0 else discord.utils.MISSING,
             view=DeleteButtonView(interaction.user.id),
         )
@@ -194,33 +413,43 @@ class FormatModal(discord.ui.Modal, title="Format V code"):
         label="Code", style=discord.TextStyle.paragraph, custom_id="code"
     )
 
+    @traced("modal.format")
+    @admitted
+    @recorded("modal_format", lambda self, interaction: {"code": self.code.value})
     async def on_submit(self, interaction: discord.Interaction["Bot"]) -> None:
         response = await interaction.client.v.format(self.code.value)
         if response.error != "":
             if len(response.error) >= 1989:
-                return await interaction.response.send_message(
+                return await respond(
+                    interaction,
                     file=discord.File(
                         io.BytesIO(response.error.encode("utf_8")), "error.rs"
                     ),
                     view=DeleteButtonView(interaction.user.id),
                 )
-            return await interaction.response.send_message(
+            return await respond(
+                interaction,
                 f"```rs\n{response.error}\n```",
                 view=DeleteButtonView(interaction.user.id),
             )
         if len(response.output) >= 1989:
-            return await interaction.response.send_message(
+            return await respond(
+                interaction,
                 file=discord.File(
                     io.BytesIO(response.output.encode("utf_8")), "output.rs"
                 ),
                 view=DeleteButtonView(interaction.user.id),
             )
         if response.output == "":
-            return await interaction.response.send_message(
-                "No output was produced.", view=DeleteButtonView(interaction.user.id)
+            return await respond(
+                interaction,
+                "No output was produced.",
+                view=DeleteButtonView(interaction.user.id),
             )
-        return await interaction.response.send_message(
-            f"```rs\n{response.output}\n```", view=DeleteButtonView(interaction.user.id)
+        return await respond(
+            interaction,
+            f"```rs\n{response.output}\n```",
+            view=DeleteButtonView(interaction.user.id),
         )
 
 
@@ -231,13 +460,83 @@ class Section:
     comments: list[str] = dataclasses.field(default_factory=lambda: [])
 
 
+def closest_header(query: str) -> str:
+    index = header_index()
+    headers = index.words
+    found = index.lookup(query)
+    if found:
+        return headers[found[0][1]]
+    scores = [levenshtein(query, h) for h in headers]
+    lowest = min(scores)
+    return headers[scores.index(lowest)]
+
+
+def closest_target(contents: typing.Any, query: str) -> int:
+    """Index into ``contents["targets"]`` of the closest name, or -1."""
+    index = contents["index"]
+    found = index.lookup(query)
+    if found:
+        return found[0][1]
+    if index.words:
+        # nothing within a couple of edits, rank every name
+        scores = [levenshtein(query, name) for name in index.words]
+        return scores.index(min(scores))
+    return -1
+
+
 class BaseCog(commands.Cog, name="base"):
-    docs: dict[str, typing.Any]
+    docs: docstore.DocStore
+    docs_task: typing.Optional[asyncio.Task[None]]
+    profiler: typing.Optional["profiler.Profiler"]
 
     def __init__(self) -> None:
-        self.docs = load_docs()
+        # filled in by load_docs, right after READY or on first use
+        self.docs = docstore.DocStore(levenshtein)
+        self.docs_task = None
+        self.profiler = None
+
+    async def load_docs(self) -> None:
+        with timeline.phase("docs"):
+            docs = docstore.DocStore(levenshtein)
+            await asyncio.to_thread(docs.load_all)
+        self.docs = docs
+
+    async def loaded_docs(self) -> docstore.DocStore:
+        """Return the docs, waiting for the initial load if it is running."""
+        if self.docs_task is None:
+            self.docs_task = asyncio.create_task(self.load_docs())
+        # a cancelled command must not cancel the load for everyone else
+        await asyncio.shield(self.docs_task)
+        return self.docs
+
+    def get_profiler(self) -> "profiler.Profiler":
+        if self.profiler is None:
+            import profiler
+
+            self.profiler = profiler.Profiler()
+        return self.profiler
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        header_index()
+        await self.loaded_docs()
+
+    async def memoized(
+        self, ctx: commands.Context["Bot"], key: str, compute: typing.Callable[[], R]
+    ) -> R:
+        """Share doc query results between processes through the bot's cache."""
+        if ctx.bot.cache is None:
+            return compute()
+        key = hashlib.sha256(key.encode("utf_8")).hexdigest()
+        value = await ctx.bot.cache.get(key)
+        if value is None:
+            value = compute()
+            await ctx.bot.cache.set(key, value, config["cache"].get("docs_ttl", 3600))
+        return value
 
     @commands.hybrid_command("docs")
+    @traced("command.docs")
+    @recorded("docs", lambda self, ctx, query: query)
     async def search_docs(self, ctx: commands.Context, query: str) -> None:
         """Search within the docs
 
@@ -247,48 +546,69 @@ class BaseCog(commands.Cog, name="base"):
             The query for the search
         """
         query = "#" + query
-        scores = [levenshtein(query, h) for h in headers]
-        lowest = min(scores)
-        header = headers[scores.index(lowest)]
+        header = await self.memoized(
+            ctx, "docs:" + query, lambda: closest_header(query)
+        )
         await ctx.send(
             f"<https://github.com/vlang/v/blob/master/doc/docs.md{header}>",
             view=DeleteButtonView(ctx.author.id),
         )
 
     @commands.hybrid_command()
-    async def vdoc(self, ctx: commands.Context, module: str, *, query: str) -> None:
+    @traced("command.vdoc")
+    @recorded(
+        "vdoc",
+        lambda self, ctx, module, *, query, version=None: [
+            module if version is None else f"{module}@{version}",
+            query,
+        ],
+    )
+    async def vdoc(
+        self,
+        ctx: commands.Context,
+        module: str,
+        *,
+        query: str,
+        version: typing.Optional[str] = None,
+    ) -> None:
         """Search within a vlib.
 
         Parameters
         ----------
         module: :class:`str`
-            The module to search in
+            The module to search in, `module@version` picks a V version
         query: :class:`str`
             The query for the search
+        version: Optional[:class:`str`]
+            The V version to search in, defaults to the latest docs
         """
-        lowest, closest = 2147483647, Section()
-        contents = self.docs.get(module)
+        if version is None and "@" in module:
+            module, _, version = module.partition("@")
+        docs = await self.loaded_docs()
+        if version is not None and version not in docs.versions:
+            await ctx.send(
+                f"Version `{version}` not found, available: "
+                + ", ".join(f"`{name}`" for name in docs.versions),
+                ephemeral=True,
+            )
+            return
+        closest = Section()
+        contents = docs.get(module, version)
         if contents is None:
             await ctx.send(f"Module `{module}` not found.", ephemeral=True)
             return
-        for section in contents["contents"]:
-            score = levenshtein(query, section["name"])
-            if score < lowest:
-                lowest = score
-                closest = Section(
-                    name=section["name"],
-                    content=section["content"],
-                    comments=[comment["text"] for comment in section["comments"]],
-                )
-            for child in section["children"]:
-                child_score = levenshtein(query, child["name"])
-                if child_score < lowest:
-                    lowest = child_score
-                    closest = Section(
-                        name=section["name"],
-                        content=section["content"],
-                        comments=[comment["text"] for comment in section["comments"]],
-                    )
+        target = await self.memoized(
+            ctx,
+            f"vdoc:{contents['hash']}:{query}",
+            lambda: closest_target(contents, query),
+        )
+        if target != -1:
+            section = contents["targets"][target]
+            closest = Section(
+                name=section["name"],
+                content=section["content"],
+                comments=[comment["text"] for comment in section["comments"]],
+            )
         description = f"```v\n{closest.content}```"
         blob = ""
         for comment in closest.comments:
@@ -297,7 +617,8 @@ class BaseCog(commands.Cog, name="base"):
             description += f"\n>>> {blob}"
         await ctx.send(
             embed=discord.Embed(
-                title=f"{module} {closest.name}",
+                title=f"{module} {closest.name}"
+                + (f" ({version})" if version is not None else ""),
                 description=description,
                 url=config.get("docs", {}).get(
                     module, f"https://modules.vlang.io/{module}.html"
@@ -313,9 +634,52 @@ class BaseCog(commands.Cog, name="base"):
     @commands.is_owner()
     async def reload_docs(self, ctx: commands.Context) -> None:
         """Reload docs."""
-        self.docs = load_docs()
+        await self.loaded_docs()
+        await self.load_docs()
         await ctx.message.add_reaction("\N{THUMBS UP SIGN}")
 
+    @commands.command("docstats", hidden=True)
+    @commands.is_owner()
+    async def doc_stats(self, ctx: commands.Context) -> None:
+        """Show memory used by the docs and their lookup indexes."""
+        stats = (await self.loaded_docs()).stats()
+        stats["header_index_build_ms"] = round(header_index().build_time * 1000)
+        stats["header_index_bytes"] = header_index().memory()
+        await ctx.send(
+            "\n".join(f"{name}: {value}" for name, value in stats.items()),
+            view=DeleteButtonView(ctx.author.id),
+        )
+
+    @commands.command("snapshot", hidden=True)
+    @commands.is_owner()
+    async def snapshot_docs(self, ctx: commands.Context, version: str) -> None:
+        """Keep the current docs as a named V version.
+
+        Parameters
+        ----------
+        version: :class:`str`
+            The name to keep the docs under, e.g. `stable` or `0.4.8`
+        """
+        if (
+            version == docstore.CURRENT_VERSION
+            or not re.fullmatch(r"[\w.-]+", version)
+            or version.startswith(".")
+        ):
+            await ctx.send(f"Invalid version name `{version}`.")
+            return
+        await ctx.typing()
+        path = join("docs", "versions", version)
+        await asyncio.to_thread(
+            shutil.copytree, join("docs", "_docs"), path, dirs_exist_ok=True
+        )
+        docs = await self.loaded_docs()
+        await asyncio.to_thread(docs.load, version, path)
+        stats = docs.stats()
+        await ctx.send(
+            f"Kept docs as `{version}`. {stats['unique_sections']} unique of {stats['sections']} sections in {stats['versions']} versions.",
+            view=DeleteButtonView(ctx.author.id),
+        )
+
     @commands.command("vup", hidden=True)
     @commands.is_owner()
     async def vup(self, ctx: commands.Context) -> None:
@@ -362,6 +726,123 @@ class BaseCog(commands.Cog, name="base"):
         else:
             await ctx.message.add_reaction("\N{THUMBS UP SIGN}")
 
+    @commands.group("profile", hidden=True, invoke_without_command=True)
+    @commands.is_owner()
+    async def profile(self, ctx: commands.Context) -> None:
+        """Profile running handlers."""
+        state = "running" if self.get_profiler().running else "stopped"
+        await ctx.send(f"Profiler is {state}.", view=DeleteButtonView(ctx.author.id))
+
+    @profile.command("start")
+    @commands.is_owner()
+    async def profile_start(self, ctx: commands.Context, mode: str = "cpu") -> None:
+        """Start profiling.
+
+        Parameters
+        ----------
+        mode: :class:`str`
+            One of `cpu`, `memory` or `all`
+        """
+        if mode not in ("cpu", "memory", "all"):
+            await ctx.send("Mode must be one of `cpu`, `memory` or `all`.")
+            return
+        try:
+            self.get_profiler().start(
+                cpu=mode in ("cpu", "all"), memory=mode in ("memory", "all")
+            )
+        except RuntimeError as exc:
+            await ctx.send(f"Cannot start profiler: {exc}.")
+            return
+        await ctx.message.add_reaction("\N{THUMBS UP SIGN}")
+
+    @profile.command("stop")
+    @commands.is_owner()
+    async def profile_stop(self, ctx: commands.Context, limit: int = 30) -> None:
+        """Stop profiling and upload the report.
+
+        Parameters
+        ----------
+        limit: :class:`int`
+            How many entries to include in the report
+        """
+        try:
+            report = self.get_profiler().stop(limit)
+        except RuntimeError as exc:
+            await ctx.send(f"Cannot stop profiler: {exc}.")
+            return
+        await ctx.send(
+            file=discord.File(io.BytesIO(report.encode("utf_8")), "profile.txt"),
+            view=DeleteButtonView(ctx.author.id),
+        )
+
+    @profile.command("dump")
+    @commands.is_owner()
+    async def profile_dump(self, ctx: commands.Context, limit: int = 30) -> None:
+        """Upload the report without stopping the profiler.
+
+        Parameters
+        ----------
+        limit: :class:`int`
+            How many entries to include in the report
+        """
+        try:
+            report = self.get_profiler().dump(limit)
+        except RuntimeError as exc:
+            await ctx.send(f"Cannot dump profiler: {exc}.")
+            return
+        await ctx.send(
+            file=discord.File(io.BytesIO(report.encode("utf_8")), "profile.txt"),
+            view=DeleteButtonView(ctx.author.id),
+        )
+
+    @commands.command("preflight", hidden=True)
+    @commands.is_owner()
+    async def preflight_stats(self, ctx: commands.Context["Bot"]) -> None:
+        """Show how many playground round trips the local syntax check saved."""
+        checker = ctx.bot.v.preflight
+        if checker is None:
+            await ctx.send(
+                "Preflight is disabled.", view=DeleteButtonView(ctx.author.id)
+            )
+            return
+        stats = checker.stats
+        await ctx.send(
+            f"Checked {stats['checked']}, rejected locally {stats['rejected']} (saved upstream calls, hit rate {checker.hit_rate:.1%}), skipped {stats['skipped']}.",
+            view=DeleteButtonView(ctx.author.id),
+        )
+
+    @commands.command("startup", hidden=True)
+    @commands.is_owner()
+    async def startup_times(self, ctx: commands.Context) -> None:
+        """Show how long each startup phase took."""
+        await ctx.send(
+            f"```\n{timeline.report()}\n```", view=DeleteButtonView(ctx.author.id)
+        )
+
+    @commands.command("lag", hidden=True)
+    @commands.is_owner()
+    async def lag(self, ctx: commands.Context["Bot"]) -> None:
+        """Show event loop lag statistics."""
+        monitor = ctx.bot.loop_monitor
+        percentiles = monitor.percentiles()
+        if not percentiles:
+            await ctx.send("No samples yet.", view=DeleteButtonView(ctx.author.id))
+            return
+        summary = ", ".join(
+            f"{name}={value * 1000:.1f}ms" for name, value in percentiles.items()
+        )
+        text = f"Loop lag over {len(monitor.samples)} samples: {summary}\nStalls over {monitor.threshold * 1000:.0f}ms: {monitor.stalls}"
+        if monitor.last_stall is None:
+            await ctx.send(text, view=DeleteButtonView(ctx.author.id))
+            return
+        await ctx.send(
+            text,
+            file=discord.File(
+                io.BytesIO(monitor.last_stall.encode("utf_8")), "last_stall.txt"
+            ),
+            view=DeleteButtonView(ctx.author.id),
+        )
+
     def clean_code(self, code: str) -> str:
         PREFIXES = ["```rs\n", "```v\n", "```\n", "``", "`"]
         for prefix in PREFIXES:
@@ -382,14 +863,28 @@ class BaseCog(commands.Cog, name="base"):
         await interaction.response.send_modal(EvalModal(timeout=None))
 
     @v.command(name="cgen", description="Show modal, then show cgen output")
-    async def slash_cgen(self, interaction: discord.Interaction["Bot"]) -> None:
-        await interaction.response.send_modal(CgenModal(timeout=None))
+    @app_commands.describe(
+        full="Show the whole generated file instead of only your code",
+        callees="Also show definitions your code directly uses",
+    )
+    async def slash_cgen(
+        self,
+        interaction: discord.Interaction["Bot"],
+        full: bool = False,
+        callees: bool = False,
+    ) -> None:
+        await interaction.response.send_modal(
+            CgenModal(full=full, callees=callees, timeout=None)
+        )
 
     @v.command(name="format", description="Show modal, then format code")
     async def slash_format(self, interaction: discord.Interaction["Bot"]) -> None:
         await interaction.response.send_modal(FormatModal(timeout=None))
 
     @commands.command("eval", aliases=["e", "exec", "exe", "evl", "run", "execute"])
+    @traced("command.eval")
+    @admitted
+    @recorded("eval", lambda self, ctx, *, code: code)
     async def text_eval(self, ctx: commands.Context["Bot"], *, code: str) -> None:
         """Execute V code.
 
@@ -398,6 +893,15 @@ class BaseCog(commands.Cog, name="base"):
         code: :class:`str`
             The V code to format
         """
+        snippets = extract_code_blocks(code)
+        if len(snippets) > 1:
+            content, files = await run_snippets(ctx.bot.v, snippets)
+            await ctx.send(
+                content,
+                files=files or None,
+                view=DeleteButtonView(ctx.author.id),
+            )
+            return
         response = await ctx.bot.v.run(self.clean_code(code))
         if response.error != "":
             if len(response.error) >= 1989:
@@ -428,14 +932,32 @@ class BaseCog(commands.Cog, name="base"):
         )
 
     @commands.command("cgen", aliases=["c", "gen", "g", "codegen", "cg", "kodegen"])
+    @traced("command.cgen")
+    @admitted
+    @recorded("cgen", lambda self, ctx, *, code: code)
     async def text_cgen(self, ctx: commands.Context["Bot"], *, code: str) -> None:
         """Show cgen output from V code.
 
         Parameters
         ----------
         code: :class:`str`
-            The V code to format
+            The V code to format, optionally preceded by `--full` to show
+            the whole generated file or `--callees` to also show definitions
+            the code directly uses
         """
+        full = callees = False
+        while code.split():
+            flag, *rest = code.split(maxsplit=1)
+            if flag == "--full":
+                full = True
+            elif flag == "--callees":
+                callees = True
+            else:
+                break
+            code = rest[0] if rest else ""
+        if not code.strip():
+            await ctx.send("Usage: `vb!cgen [--full] [--callees] <code>`")
+            return
         response = await ctx.bot.v.cgen(self.clean_code(code))
         if response.error != "":
             if len(response.error) >= 1989:
@@ -451,19 +973,19 @@ class BaseCog(commands.Cog, name="base"):
                     view=DeleteButtonView(ctx.author.id),
                 )
             return
-        elif len(response.cgen_code) >= 1990:
+        cgen_code = await trim_cgen(response.cgen_code, full=full, callees=callees)
+        if len(cgen_code) >= 1990:
             await ctx.send(
-                file=discord.File(
-                    io.BytesIO(response.cgen_code.encode("utf_8")), "output.c"
-                ),
+                file=discord.File(io.BytesIO(cgen_code.encode("utf_8")), "output.c"),
                 view=DeleteButtonView(ctx.author.id),
             )
             return
-        await ctx.send(
-            f"```c\n{response.cgen_code}\n```", view=DeleteButtonView(ctx.author.id)
-        )
+        await ctx.send(f"```c\n{cgen_code}\n```", view=DeleteButtonView(ctx.author.id))
 
     @commands.command("format", aliases=["f", "fmt", "formt"])
+    @traced("command.format")
+    @admitted
+    @recorded("format", lambda self, ctx, *, code: code)
     async def text_format(self, ctx: commands.Context["Bot"], *, code: str) -> None:
         """Format V code.
 
@@ -511,9 +1033,34 @@ class Context(commands.Context["Bot"]):
     def clean_prefix(self) -> str:
         return self.prefix or str(self.bot.command_prefix)
 
+    async def send(self, *args: typing.Any, **kwargs: typing.Any) -> discord.Message:
+        with tracing.span("discord.send"):
+            message = await super().send(*args, **kwargs)
+        timeline.mark_reply()
+        return message
+
 
 class Bot(commands.Bot):
     _v: typing.Optional[vplayground.V]
+    cache: typing.Optional[cache.Cache]
+    admission: admission.Admission
+    loop_monitor: loopmonitor.LoopMonitor
+    # loaded once READY arrives when starting fast
+    pending_extensions: list[str]
+    connecting: float
+
+    async def setup_hook(self) -> None:
+        timeline.record("login", self.connecting)
+        self.connecting = time.perf_counter()
+
+    async def on_ready(self) -> None:
+        if timeline.ready is None:
+            timeline.record("connect", self.connecting)
+            timeline.mark_ready()
+        pending, self.pending_extensions = self.pending_extensions, []
+        for name in pending:
+            with timeline.phase(name):
+                await self.load_extension(name)
 
     @property
     def v(self) -> vplayground.V:
@@ -576,6 +1123,14 @@ class DeleteButtonView(discord.ui.View):
 
 async def main() -> None:
     discord.utils.setup_logging()
+    begin = time.perf_counter()
+    tracing.configure(**config.get("tracing", {}))
+    recording.configure(**config.get("recording", {}))
+    bot.cache = None
+    if "cache" in config:
+        bot.cache = cache.Cache(
+            redis=config["cache"].get("redis"), size=config["cache"].get("size", 1024)
+        )
     bot._v = vplayground.V(
         aiohttp.ClientSession(
             headers={
@@ -584,10 +1139,38 @@ async def main() -> None:
                     aiohttp.__version__,
                 ),
             }
-        )
+        ),
+        cache=bot.cache,
+        cache_ttl=config.get("cache", {}).get("playground_ttl", 300),
+        cache_runs=config.get("cache", {}).get("cache_runs", False),
+        max_concurrency=config.get("admission", {}).get("max_in_flight", 16),
+        preflight=(
+            preflight.Preflight(**config["preflight"])
+            if "preflight" in config
+            else None
+        ),
+        max_response_bytes=config.get("max_response_bytes", 4 << 20),
+    )
+    bot.loop_monitor = loopmonitor.LoopMonitor(**config.get("loop_monitor", {}))
+    bot.loop_monitor.start(asyncio.get_running_loop())
+    bot.admission = admission.Admission(
+        bot.v, bot.loop_monitor, **config.get("admission", {})
     )
-    await bot.add_cog(BaseCog())
-    await bot.load_extension("jishaku")
+    cog = BaseCog()
+    await bot.add_cog(cog)
+    timeline.record("setup", begin)
+    extensions = config.get("extensions", ["jishaku"])
+    if config.get("fast_start", False):
+        # connect first, docs and extensions follow on READY
+        bot.pending_extensions = extensions
+    else:
+        bot.pending_extensions = []
+        header_index()
+        await cog.loaded_docs()
+        for name in extensions:
+            with timeline.phase(name):
+                await bot.load_extension(name)
+    bot.connecting = time.perf_counter()
     await bot.start(config["token"])
 
 
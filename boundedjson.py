@@ -0,0 +1,265 @@
+"""Incremental decoding of flat JSON objects under a size cap.
+
+Playground responses are a single object of (mostly) string fields, one of
+which can be arbitrarily large when a program prints in a loop. Instead of
+buffering the whole body, :class:`Decoder` is fed the body chunk by chunk and
+keeps only the first and last bytes of every string field, still JSON
+escaped. Only those windows are decoded at the end, with a marker in between
+telling how much was dropped, so no more than ``limit`` bytes of field content
+are ever held for a response.
+"""
+
+import json
+import typing
+
+WHITESPACE = b" \t\r\n"
+BACKSLASH = 0x5C
+QUOTE = 0x22
+
+# string fields sharing the budget, any further ones come out empty
+MAX_FIELDS = 4
+MAX_KEY = 256
+# longest escape sequence plus a multibyte character
+SLACK = 8
+
+
+class Field:
+    """Head and tail windows over the raw bytes of one string.
+
+    Both windows start and end between escape sequences and UTF-8 characters,
+    so each decodes on its own. Keeping the tail aligned can cost a few bytes
+    more than its share, which is set aside from ``limit`` up front.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.head_limit = limit // 2
+        self.tail_limit = max(limit - self.head_limit - SLACK, 0)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.head_full = False
+        self.size = 0
+
+    def add(self, data: typing.Union[bytes, memoryview]) -> None:
+        self.size += len(data)
+        if self.head_full:
+            self.tail += data
+        else:
+            # only cut once the next bytes show where an escape ends
+            self.head += data
+            if len(self.head) <= self.head_limit:
+                return
+            end = _aligned(self.head, self.head_limit, forward=False)
+            self.tail = self.head[end:]
+            del self.head[end:]
+            self.head_full = True
+        if len(self.tail) > self.tail_limit:
+            # deleting from the front of a bytearray does not move the rest
+            del self.tail[: _aligned(self.tail, len(self.tail) - self.tail_limit)]
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > len(self.head) + len(self.tail)
+
+    def value(self) -> str:
+        if not self.truncated:
+            return json.loads(b'"' + self.head + self.tail + b'"')
+        head = json.loads(b'"' + self.head + b'"')
+        # a surrogate pair may have been cut in two
+        if head and "\ud800" <= head[-1] <= "\udbff":
+            head = head[:-1]
+        start = 0
+        while start < len(self.tail) and _continuation(self.tail[start]):
+            start += 1
+        tail = json.loads(b'"' + self.tail[start:] + b'"')
+        if tail and "\udc00" <= tail[0] <= "\udfff":
+            tail = tail[1:]
+        omitted = self.size - len(self.head) - len(self.tail)
+        return head + f"\n... [{omitted} bytes truncated] ...\n" + tail
+
+
+def _continuation(byte: int) -> bool:
+    return 0x80 <= byte < 0xC0
+
+
+def _inside(data: bytearray, position: int) -> bool:
+    """Whether ``position`` splits an escape sequence or a UTF-8 character.
+
+    ``data`` must start between two of them.
+    """
+    if position < len(data) and _continuation(data[position]):
+        return True
+    for i in range(position - 1, max(position - 6, -1), -1):
+        if data[i] != BACKSLASH:
+            continue
+        run = i
+        while run > 0 and data[run - 1] == BACKSLASH:
+            run -= 1
+        if (i - run) % 2 == 1:
+            # escaped by the backslash before it, which ends right here
+            return False
+        unicode = i + 1 < len(data) and data[i + 1] == ord("u")
+        return position < i + (6 if unicode else 2)
+    return False
+
+
+def _aligned(data: bytearray, position: int, *, forward: bool = True) -> int:
+    """Move ``position`` to the nearest point between escapes and characters."""
+    if forward:
+        for candidate in range(position, min(position + SLACK, len(data)) + 1):
+            if not _inside(data, candidate):
+                return candidate
+    while position > 0 and _inside(data, position):
+        position -= 1
+    return position
+
+
+class Decoder:
+    """Decode one JSON object fed in arbitrary chunks.
+
+    String values longer than their share of ``limit`` are cut down to a head
+    and a tail and their keys listed in :attr:`truncated`. Other values
+    (numbers, literals, nested containers) are rare here and decoded whole,
+    up to the same share.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.field_limit = limit // MAX_FIELDS
+        self.fields = 0
+        self.result: dict[str, typing.Any] = {}
+        self.truncated: list[str] = []
+        self.state = "start"
+        self.key = ""
+        self.kind = ""
+        self.string: typing.Optional[Field] = None
+        # parity of the backslashes ending the previous chunk inside a string
+        self.escaped = False
+        self.raw = bytearray()
+        self.raw_size = 0
+        self.raw_depth = 0
+        self.raw_in_string = False
+        self.raw_escaped = False
+
+    def feed(self, chunk: bytes) -> None:
+        view = memoryview(chunk)
+        i = 0
+        n = len(chunk)
+        while i < n:
+            state = self.state
+            if state == "string":
+                i = self._string(chunk, view, i)
+                continue
+            if state == "raw":
+                i = self._raw(chunk, i)
+                continue
+            byte = chunk[i]
+            if byte in WHITESPACE:
+                i += 1
+                continue
+            i += 1
+            if state == "start" and byte == ord("{"):
+                self.state = "key or end"
+            elif state in ("key", "key or end") and byte == QUOTE:
+                self._open(Field(MAX_KEY * 2), "key string")
+            elif state == "key or end" and byte == ord("}"):
+                self.state = "done"
+            elif state == "colon" and byte == ord(":"):
+                self.state = "value"
+            elif state == "value" and byte == QUOTE:
+                self.fields += 1
+                limit = self.field_limit if self.fields <= MAX_FIELDS else 0
+                self._open(Field(limit), "value string")
+            elif state == "value":
+                self.state = "raw"
+                i -= 1
+            elif state == "next" and byte == ord(","):
+                self.state = "key"
+            elif state == "next" and byte == ord("}"):
+                self.state = "done"
+            else:
+                raise ValueError(f"unexpected {chr(byte)!r} in JSON object")
+
+    def _open(self, field: Field, kind: str) -> None:
+        self.string = field
+        self.kind = kind
+        self.escaped = False
+        self.state = "string"
+
+    def _string(self, chunk: bytes, view: memoryview, start: int) -> int:
+        field = typing.cast(Field, self.string)
+        i = start
+        while True:
+            end = chunk.find(b'"', i)
+            if end == -1:
+                field.add(view[start:])
+                self.escaped = _odd_backslashes(chunk, start, len(chunk), self.escaped)
+                return len(chunk)
+            if not _odd_backslashes(chunk, start, end, self.escaped):
+                break
+            i = end + 1
+        field.add(view[start:end])
+        self._close(field)
+        return end + 1
+
+    def _close(self, field: Field) -> None:
+        if self.kind == "key string":
+            if field.truncated:
+                raise ValueError("JSON object key too long")
+            self.key = field.value()
+            self.state = "colon"
+            return
+        self.result[self.key] = field.value()
+        if field.truncated:
+            self.truncated.append(self.key)
+        self.string = None
+        self.state = "next"
+
+    def _raw(self, chunk: bytes, start: int) -> int:
+        i = start
+        n = len(chunk)
+        while i < n:
+            byte = chunk[i]
+            if self.raw_in_string:
+                if self.raw_escaped:
+                    self.raw_escaped = False
+                elif byte == BACKSLASH:
+                    self.raw_escaped = True
+                elif byte == QUOTE:
+                    self.raw_in_string = False
+            elif byte == QUOTE:
+                self.raw_in_string = True
+            elif byte in b"[{":
+                self.raw_depth += 1
+            elif byte in b"]}" and self.raw_depth:
+                self.raw_depth -= 1
+            elif self.raw_depth == 0 and (byte in b",}" or byte in WHITESPACE):
+                break
+            i += 1
+        self.raw_size += i - start
+        if self.raw_size <= self.field_limit:
+            self.raw += chunk[start:i]
+        if i < n:
+            if self.raw_size <= self.field_limit:
+                self.result[self.key] = json.loads(self.raw)
+            else:
+                self.result[self.key] = None
+                self.truncated.append(self.key)
+            self.raw = bytearray()
+            self.raw_size = 0
+            self.state = "next"
+        return i
+
+    def close(self) -> dict[str, typing.Any]:
+        if self.state != "done":
+            raise ValueError("incomplete JSON object")
+        return self.result
+
+
+def _odd_backslashes(chunk: bytes, start: int, end: int, carried: bool) -> bool:
+    """Whether ``chunk[end]`` follows an odd run of backslashes."""
+    i = end
+    while i > start and chunk[i - 1] == BACKSLASH:
+        i -= 1
+    odd = (end - i) % 2 == 1
+    if i == start and carried:
+        odd = not odd
+    return odd
@@ -0,0 +1,225 @@
+"""Two-tier cache: an in-process LRU in front of an optional Redis server.
+
+The second tier lets several bot processes share playground results and doc
+query memos. It speaks just enough of the Redis protocol (RESP2) to ``MGET``
+and pipeline ``SET ... EX``, so any Redis-compatible server works. When the
+server cannot be reached the cache quietly degrades to the first tier and
+retries the server after a while.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+import time
+import typing
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+
+class RedisError(Exception):
+    pass
+
+
+# everything a broken or unreachable server can raise, ValueError being a
+# malformed reply
+ERRORS = (
+    OSError,
+    EOFError,
+    ValueError,
+    asyncio.TimeoutError,
+    asyncio.LimitOverrunError,
+    RedisError,
+)
+
+
+class Redis:
+    """Minimal RESP2 client over a single connection."""
+
+    def __init__(self, url: str, *, timeout: float = 0.5) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"unsupported cache url {url!r}")
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.reader: typing.Optional[asyncio.StreamReader] = None
+        self.writer: typing.Optional[asyncio.StreamWriter] = None
+        self.lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password is not None:
+            setup.append(("AUTH", self.password))
+        if self.db != 0:
+            setup.append(("SELECT", str(self.db)))
+        if setup:
+            await self._roundtrip(setup)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    @staticmethod
+    def _encode(command: typing.Sequence[typing.Union[str, bytes]]) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for argument in command:
+            if isinstance(argument, str):
+                argument = argument.encode("utf_8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(argument), argument))
+        return b"".join(parts)
+
+    async def _read(self) -> typing.Any:
+        reader = typing.cast(asyncio.StreamReader, self.reader)
+        line = await reader.readuntil(b"\r\n")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode("utf_8", "replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            return (await reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [await self._read() for _ in range(length)]
+        raise RedisError(f"unexpected reply {line!r}")
+
+    async def _roundtrip(
+        self, commands: typing.Sequence[typing.Sequence[typing.Union[str, bytes]]]
+    ) -> list[typing.Any]:
+        writer = typing.cast(asyncio.StreamWriter, self.writer)
+        writer.write(b"".join(self._encode(command) for command in commands))
+        await writer.drain()
+        return [await self._read() for _ in commands]
+
+    async def pipeline(
+        self, commands: typing.Sequence[typing.Sequence[typing.Union[str, bytes]]]
+    ) -> list[typing.Any]:
+        """Send all commands at once and return their replies in order."""
+        async with self.lock:
+            try:
+                if self.writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout)
+                return await asyncio.wait_for(self._roundtrip(commands), self.timeout)
+            except BaseException:
+                # the connection may be left mid-reply, start over next time
+                self.close()
+                raise
+
+
+class Cache:
+    """LRU of JSON-serializable values with an optional shared second tier."""
+
+    def __init__(
+        self,
+        *,
+        redis: typing.Optional[str] = None,
+        size: int = 1024,
+        prefix: str = "vbot:",
+        retry_after: float = 30.0,
+    ) -> None:
+        self.size = size
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self.local: collections.OrderedDict[str, tuple[float, typing.Any]] = (
+            collections.OrderedDict()
+        )
+        self.remote = Redis(redis) if redis is not None else None
+        self.down_until = 0.0
+        self.stats = {"local_hits": 0, "remote_hits": 0, "misses": 0, "errors": 0}
+
+    def _remember(self, key: str, value: typing.Any, ttl: float) -> None:
+        self.local[key] = (time.monotonic() + ttl, value)
+        self.local.move_to_end(key)
+        while len(self.local) > self.size:
+            self.local.popitem(last=False)
+
+    def _recall(self, key: str) -> typing.Optional[typing.Any]:
+        entry = self.local.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.local[key]
+            return None
+        self.local.move_to_end(key)
+        return value
+
+    def _remote_available(self) -> bool:
+        return self.remote is not None and time.monotonic() >= self.down_until
+
+    def _remote_failed(self, exc: BaseException) -> None:
+        self.stats["errors"] += 1
+        self.down_until = time.monotonic() + self.retry_after
+        logger.warning(
+            "Shared cache unavailable, using local cache for %.0fs: %r",
+            self.retry_after,
+            exc,
+        )
+
+    async def get(self, key: str) -> typing.Optional[typing.Any]:
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: list[str]) -> list[typing.Optional[typing.Any]]:
+        """Look up several keys, going to the server at most once."""
+        values = [self._recall(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        self.stats["local_hits"] += len(keys) - len(missing)
+        if missing and self._remote_available():
+            remote = typing.cast(Redis, self.remote)
+            try:
+                (replies,) = await remote.pipeline(
+                    [["MGET", *(self.prefix + keys[i] for i in missing)]]
+                )
+            except ERRORS as exc:
+                self._remote_failed(exc)
+            else:
+                for i, reply in zip(missing, replies):
+                    if reply is None:
+                        continue
+                    try:
+                        values[i] = json.loads(reply)
+                    except ValueError:
+                        # not written by us, or corrupted, same as a miss
+                        continue
+                    # remote TTL is unknown here, keep it locally only briefly
+                    self._remember(keys[i], values[i], self.retry_after)
+                    self.stats["remote_hits"] += 1
+        self.stats["misses"] += sum(1 for value in values if value is None)
+        return values
+
+    async def set(self, key: str, value: typing.Any, ttl: float) -> None:
+        await self.set_many({key: value}, ttl)
+
+    async def set_many(self, items: dict[str, typing.Any], ttl: float) -> None:
+        for key, value in items.items():
+            self._remember(key, value, ttl)
+        if items and self._remote_available():
+            remote = typing.cast(Redis, self.remote)
+            try:
+                await remote.pipeline(
+                    [
+                        [
+                            "SET",
+                            self.prefix + key,
+                            json.dumps(value),
+                            "EX",
+                            str(int(ttl)),
+                        ]
+                        for key, value in items.items()
+                    ]
+                )
+            except ERRORS as exc:
+                self._remote_failed(exc)
@@ -0,0 +1,183 @@
+"""Trim V cgen output down to the declarations coming from the user's module.
+
+The playground returns the whole generated C file, most of which is builtin.
+:func:`trim` makes a single pass over the file, splitting it into top-level
+declarations by tracking brace depth (ignoring braces in string and character
+literals and in comments), and keeps only those whose declared name belongs
+to the user's module (``main__`` by default), optionally with the definitions
+they directly reference.
+"""
+
+import re
+import typing
+
+LITERALS = re.compile(
+    r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|//.*|/\*.*?\*/|(?P<open>/\*.*)'
+)
+IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+TAGGED = re.compile(r"(?:typedef\s+)?(?:struct|union|enum)\s+(\w+)\s*\{")
+FUNCTION_POINTER = re.compile(r"\(\s*\*\s*(\w+)\s*\)")
+DEFINE = re.compile(r"#\s*define\s+(\w+)")
+
+
+class Unbalanced(ValueError):
+    """The code ended inside a block comment or with unclosed braces."""
+
+
+class Declaration(typing.NamedTuple):
+    name: str
+    start: int
+    end: int
+    is_prototype: bool
+
+
+def declared_name(header: str) -> str:
+    """Best effort name of the symbol declared by a top-level chunk."""
+    header = header.strip()
+    if header.startswith("#"):
+        match = DEFINE.match(header)
+        return match[1] if match else ""
+    match = TAGGED.match(header)
+    if match is not None:
+        return match[1]
+    if header.startswith("typedef"):
+        match = FUNCTION_POINTER.search(header)
+        if match is not None:
+            return match[1]
+        names = IDENTIFIER.findall(header.split(";", 1)[0])
+        return names[-1] if names else ""
+    cut = len(header)
+    for stop in "(=[{;":
+        index = header.find(stop)
+        if index != -1 and index < cut:
+            cut = index
+    names = IDENTIFIER.findall(header[:cut])
+    return names[-1] if names else ""
+
+
+def strip_line(line: str, in_comment: bool) -> tuple[str, bool]:
+    """Drop literals and comments from ``line``.
+
+    Returns what is left and whether a block comment is still open after it.
+    """
+    if in_comment:
+        end = line.find("*/")
+        if end == -1:
+            return "", True
+        line = line[end + 2 :]
+    if '"' not in line and "'" not in line and "/" not in line:
+        return line, False
+    code_only = []
+    position = 0
+    for match in LITERALS.finditer(line):
+        code_only.append(line[position : match.start()])
+        position = match.end()
+        if match["open"] is not None:
+            return " ".join(code_only), True
+    code_only.append(line[position:])
+    # literals and comments separate tokens, keep them apart
+    return " ".join(code_only), False
+
+
+def scan(code: str) -> typing.Iterator[Declaration]:
+    """Yield top-level declarations of ``code`` in order, in one pass.
+
+    Raises :class:`Unbalanced` at the end when the braces or block comments
+    did not balance, since the chunks found are then not trustworthy.
+    """
+    depth = 0
+    start = -1
+    header = ""
+    braced = False
+    in_comment = False
+    position = 0
+    length = len(code)
+    while position < length:
+        newline = code.find("\n", position)
+        if newline == -1:
+            newline = length
+        line = code[position:newline]
+        code_only, in_comment_after = strip_line(line, in_comment)
+        if depth == 0 and start == -1:
+            stripped = code_only.lstrip()
+            if stripped == "":
+                in_comment = in_comment_after
+                position = newline + 1
+                continue
+            if stripped.startswith("#"):
+                end = newline
+                # multi-line macros continue with a trailing backslash
+                while code[position:end].endswith("\\") and end < length:
+                    following = code.find("\n", end + 1)
+                    end = length if following == -1 else following
+                yield Declaration(declared_name(stripped), position, end, False)
+                position = end + 1
+                continue
+            start = position
+            header = code_only
+            braced = False
+        in_comment = in_comment_after
+        braced = braced or "{" in code_only
+        depth += code_only.count("{") - code_only.count("}")
+        if depth <= 0:
+            depth = 0
+            tail = code_only.rstrip()
+            if tail.endswith(";") or tail.endswith("}"):
+                is_prototype = (
+                    not braced
+                    and "(" in header
+                    and "=" not in header.split("(", 1)[0]
+                    and not header.lstrip().startswith("typedef")
+                )
+                yield Declaration(declared_name(header), start, newline, is_prototype)
+                start = -1
+        position = newline + 1
+    if in_comment or depth > 0:
+        raise Unbalanced("unterminated block comment or braces")
+    if start != -1:
+        yield Declaration(declared_name(header), start, length, False)
+
+
+def trim(code: str, *, module: str = "main", callees: bool = False) -> str:
+    """Return only the declarations of ``module`` from generated C code.
+
+    Function prototypes are dropped since their definitions are kept. When
+    ``callees`` is true, definitions of symbols directly referenced by the
+    kept declarations are included as well. Returns an empty string, so the
+    caller falls back to the whole file, when nothing from ``module`` was
+    found or the file could not be split reliably.
+    """
+    # anchored, so that ``domain__`` is not ``main__`` but ``Array_main__`` is
+    own = re.compile(r"(?:^|_)" + re.escape(module) + "__")
+    try:
+        declarations = [
+            declaration
+            for declaration in scan(code)
+            if declaration.name != "" and not declaration.is_prototype
+        ]
+    except Unbalanced:
+        return ""
+    keep = [own.search(declaration.name) is not None for declaration in declarations]
+    entry = module + "__main"
+    if re.search(r"\b" + re.escape(entry) + r"\s*\(", code) is not None and not any(
+        kept and declaration.name == entry
+        for declaration, kept in zip(declarations, keep)
+    ):
+        # the entry point got merged into some other chunk
+        return ""
+    if callees:
+        referenced: set[str] = set()
+        for declaration, kept in zip(declarations, keep):
+            if kept:
+                referenced.update(
+                    IDENTIFIER.findall(code, declaration.start, declaration.end)
+                )
+        keep = [
+            kept or declaration.name in referenced
+            for declaration, kept in zip(declarations, keep)
+        ]
+    return "\n\n".join(
+        code[declaration.start : declaration.end]
+        for declaration, kept in zip(declarations, keep)
+        if kept
+    )
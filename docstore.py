@@ -0,0 +1,238 @@
+"""Parsed ``v doc`` output for several V versions side by side.
+
+Each version maps module names to parsed module docs. Sections and modules
+with identical content are stored once and shared between versions, keyed by
+a hash of their content, so keeping an old snapshot around only costs memory
+for what changed since.
+
+Every module also carries a :class:`symspell.SymSpell` index over its section
+and child names under ``"index"``, with ``"targets"`` mapping each indexed
+name back to its section.
+"""
+
+import functools
+import hashlib
+import json
+import os
+from os.path import join
+import symspell
+import sys
+import time
+import traceback
+import tracemalloc
+import typing
+
+
+@functools.cache
+def _msgspec() -> typing.Any:
+    # imported on first use, it is the slowest import on the startup path
+    try:
+        import msgspec
+    except ImportError:
+        return None
+    return msgspec
+
+
+CURRENT_VERSION = "master"
+
+
+# the only parts of ``v doc -f json`` output the bot reads, everything else
+# (positions, attributes, nested children metadata) is skipped while decoding
+class Comment(typing.TypedDict):
+    text: str
+
+
+class Child(typing.TypedDict):
+    name: str
+
+
+class DocSection(typing.TypedDict):
+    name: str
+    content: str
+    comments: list[Comment]
+    children: list[Child]
+
+
+class ModuleDoc(typing.TypedDict):
+    contents: list[DocSection]
+
+
+def project(doc: typing.Any) -> ModuleDoc:
+    """Keep only the fields of a fully parsed module that the bot uses."""
+    return {
+        "contents": [
+            {
+                "name": section["name"],
+                "content": section["content"],
+                "comments": [
+                    {"text": comment["text"]} for comment in section["comments"]
+                ],
+                "children": [{"name": child["name"]} for child in section["children"]],
+            }
+            for section in doc["contents"]
+        ]
+    }
+
+
+def decode(data: bytes) -> ModuleDoc:
+    msgspec = _msgspec()
+    if msgspec is not None:
+        return msgspec.json.decode(data, type=ModuleDoc)
+    return project(json.loads(data))
+
+
+def load_docs(
+    path: str = join("docs", "_docs"), *, full: bool = False
+) -> dict[str, typing.Any]:
+    """Load every module in ``path``, only the used fields unless ``full``."""
+    docs = {}
+    for module in os.listdir(path):
+        if not module.endswith(".json"):
+            continue
+        module_name = module[:-5]
+        try:
+            with open(join(path, module), "rb") as doc:
+                docs[module_name] = json.load(doc) if full else decode(doc.read())
+        except Exception as exc:
+            print(f"[vlib:{module_name}] Loading failed")
+            traceback.print_exception(exc)
+    return docs
+
+
+def content_hash(value: typing.Any) -> bytes:
+    return hashlib.blake2b(
+        json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf_8"),
+        digest_size=16,
+    ).digest()
+
+
+class DocStore:
+    versions: dict[str, dict[str, typing.Any]]
+
+    def __init__(self, distance: typing.Callable[[str, str], int]) -> None:
+        self.versions = {}
+        self.distance = distance
+        self._modules: dict[bytes, typing.Any] = {}
+        self._sections: dict[bytes, typing.Any] = {}
+
+    def load(self, version: str, path: str) -> None:
+        """Load (or replace) ``version`` from a directory of ``v doc`` JSON."""
+        modules = {}
+        for name, doc in load_docs(path).items():
+            hashes = []
+            contents = []
+            for section in doc.get("contents", []):
+                key = content_hash(section)
+                contents.append(self._sections.setdefault(key, section))
+                hashes.append(key)
+            module_key = hashlib.blake2b(b"".join(hashes), digest_size=16).digest()
+            module = self._modules.get(module_key)
+            if module is None:
+                module = self._modules[module_key] = self._index(contents)
+                module["hash"] = module_key.hex()
+            modules[name] = module
+        self.versions[version] = modules
+        self._collect()
+
+    def load_all(self, root: str = "docs") -> None:
+        """Load the current docs and every snapshot under ``root/versions``."""
+        self.load(CURRENT_VERSION, join(root, "_docs"))
+        snapshots = join(root, "versions")
+        if os.path.isdir(snapshots):
+            for version in sorted(os.listdir(snapshots)):
+                path = join(snapshots, version)
+                if os.path.isdir(path) and version != CURRENT_VERSION:
+                    self.load(version, path)
+
+    def drop(self, version: str) -> None:
+        del self.versions[version]
+        self._collect()
+
+    def get(
+        self, module: str, version: typing.Optional[str] = None
+    ) -> typing.Optional[typing.Any]:
+        return self.versions.get(version or CURRENT_VERSION, {}).get(module)
+
+    def _index(self, contents: list[typing.Any]) -> dict[str, typing.Any]:
+        names = []
+        targets = []
+        for section in contents:
+            names.append(section["name"])
+            targets.append(section)
+            for child in section["children"]:
+                names.append(child["name"])
+                targets.append(section)
+        return {
+            "contents": contents,
+            "index": symspell.SymSpell(names, self.distance),
+            "targets": targets,
+        }
+
+    def stats(self) -> dict[str, int]:
+        modules = sum(len(modules) for modules in self.versions.values())
+        sections = sum(
+            len(module["contents"])
+            for modules in self.versions.values()
+            for module in modules.values()
+        )
+        return {
+            "versions": len(self.versions),
+            "modules": modules,
+            "unique_modules": len(self._modules),
+            "sections": sections,
+            "unique_sections": len(self._sections),
+            "index_build_ms": round(
+                sum(module["index"].build_time for module in self._modules.values())
+                * 1000
+            ),
+            "index_bytes": sum(
+                module["index"].memory() for module in self._modules.values()
+            ),
+        }
+
+    def _collect(self) -> None:
+        """Forget pooled modules and sections no version refers to anymore."""
+        modules = {
+            id(module)
+            for version in self.versions.values()
+            for module in version.values()
+        }
+        self._modules = {
+            key: module
+            for key, module in self._modules.items()
+            if id(module) in modules
+        }
+        sections = {
+            id(section)
+            for module in self._modules.values()
+            for section in module["contents"]
+        }
+        self._sections = {
+            key: section
+            for key, section in self._sections.items()
+            if id(section) in sections
+        }
+
+
+def benchmark(path: str = join("docs", "_docs")) -> None:
+    """Compare the full parse against the partial decode on a ``v doc`` dump."""
+    modes = [
+        ("full json", True),
+        ("partial (" + ("msgspec" if _msgspec() else "json") + ")", False),
+    ]
+    for name, full in modes:
+        started = time.perf_counter()
+        load_docs(path, full=full)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        docs = load_docs(path, full=full)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del docs
+        print(
+            f"{name:<20} {elapsed * 1000:8.1f} ms  retained {retained / 2**20:6.1f} MiB  peak {peak / 2**20:6.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    benchmark(*sys.argv[1:])
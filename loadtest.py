@@ -0,0 +1,343 @@
+"""Offline load generator for the bot's command handlers.
+
+Drives the ``BaseCog`` command callbacks and modal ``on_submit`` handlers with
+fake contexts and interactions against a local playground stub, then reports
+throughput and latency percentiles. Run it from the bot directory, since
+``bot`` reads ``config.json``, ``headers.json`` and ``docs/``::
+
+    python3 loadtest.py --rate 50 --duration 30 --latency 0.4 --error-rate 0.01
+"""
+
+import aiohttp
+from aiohttp import web
+import argparse
+import asyncio
+import dataclasses
+import json
+import random
+import sys
+import time
+import types
+import typing
+import bot
+import vplayground
+
+SNIPPETS = [
+    'println("Hello, World!")',
+    "fn main() {\n\tmut sum := 0\n\tfor i in 0 .. 100 {\n\t\tsum += i\n\t}\n\tprintln(sum)\n}",
+    "struct Point {\n\tx int\n\ty int\n}\n\nfn main() {\n\tp := Point{1, 2}\n\tprintln(p)\n}",
+    "fn main() {\n\tnums := [1, 2, 3].map(it * 2)\n\tprintln(nums)\n}",
+]
+DOC_QUERIES = ["strings", "sum types", "structs", "modules", "closures", "defer"]
+VDOC_QUERIES = [("os", "read_file"), ("strings", "Builder"), ("json", "decode")]
+KINDS = [
+    "eval",
+    "cgen",
+    "format",
+    "docs",
+    "vdoc",
+    "modal_eval",
+    "modal_cgen",
+    "modal_format",
+]
+
+
+class StubPlayground:
+    """Local stand-in for play.vlang.io with injectable latency and errors."""
+
+    latency: float
+    jitter: float
+    error_rate: float
+    output_size: int
+    cgen_size: int
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.3,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        output_size: int = 64,
+        cgen_size: int = 200_000,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.output_size = output_size
+        self.cgen_size = cgen_size
+        self.runner: typing.Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/run", self.handle)
+        app.router.add_post("/run_test", self.handle)
+        app.router.add_post("/cgen", self.handle)
+        app.router.add_post("/format", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def body(self, endpoint: str, form: typing.Mapping[str, str]) -> dict[str, str]:
+        if endpoint == "cgen":
+            return {"cgenCode": "x" * self.cgen_size, "error": ""}
+        if endpoint == "format":
+            return {"output": form.get("code", ""), "error": ""}
+        return {"output": "o" * self.output_size, "buildOutput": "", "error": ""}
+
+    def reply(
+        self, endpoint: str, form: typing.Mapping[str, str]
+    ) -> tuple[float, typing.Optional[dict[str, str]]]:
+        """Return how long to wait and the body to send, None for an error."""
+        delay = max(0.0, random.gauss(self.latency, self.jitter))
+        if random.random() < self.error_rate:
+            return delay, None
+        return delay, self.body(endpoint, form)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        delay, body = self.reply(
+            request.path.strip("/"), typing.cast(typing.Mapping[str, str], form)
+        )
+        await asyncio.sleep(delay)
+        if body is None:
+            return web.Response(status=500, text="stub failure")
+        return web.json_response(body)
+
+
+class FakeMessage:
+    async def add_reaction(self, emoji: str) -> None:
+        pass
+
+
+class FakeContext:
+    """Just enough of :class:`commands.Context` for the ``BaseCog`` handlers."""
+
+    def __init__(self, fake_bot: typing.Any, user_id: int) -> None:
+        self.bot = fake_bot
+        self.author = types.SimpleNamespace(id=user_id)
+        self.message = FakeMessage()
+        self.sent: list[dict[str, typing.Any]] = []
+
+    async def send(self, content: typing.Optional[str] = None, **kwargs) -> None:
+        self.sent.append({"content": content, **kwargs})
+
+    async def typing(self) -> None:
+        pass
+
+
+class FakeInteractionResponse:
+    def __init__(self) -> None:
+        self.sent: list[dict[str, typing.Any]] = []
+
+    async def send_message(
+        self, content: typing.Optional[str] = None, **kwargs
+    ) -> None:
+        self.sent.append({"content": content, **kwargs})
+
+
+class FakeInteraction:
+    """Just enough of :class:`discord.Interaction` for the modal handlers."""
+
+    def __init__(self, fake_bot: typing.Any, user_id: int) -> None:
+        self.client = fake_bot
+        self.user = types.SimpleNamespace(id=user_id)
+        self.response = FakeInteractionResponse()
+
+
+def fake_modal(**values: str) -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        **{name: types.SimpleNamespace(value=value) for name, value in values.items()}
+    )
+
+
+async def invoke(
+    cog: bot.BaseCog, fake_bot: typing.Any, kind: str, payload: typing.Any
+) -> None:
+    """Run one handler the same way discord.py would dispatch it."""
+    user_id = random.randrange(1, 2**63)
+    if kind == "eval":
+        ctx = FakeContext(fake_bot, user_id)
+        await bot.BaseCog.text_eval.callback(cog, ctx, code=payload)
+    elif kind == "cgen":
+        ctx = FakeContext(fake_bot, user_id)
+        await bot.BaseCog.text_cgen.callback(cog, ctx, code=payload)
+    elif kind == "format":
+        ctx = FakeContext(fake_bot, user_id)
+        await bot.BaseCog.text_format.callback(cog, ctx, code=payload)
+    elif kind == "docs":
+        ctx = FakeContext(fake_bot, user_id)
+        await bot.BaseCog.search_docs.callback(cog, ctx, payload)
+    elif kind == "vdoc":
+        ctx = FakeContext(fake_bot, user_id)
+        module, query = payload
+        await bot.BaseCog.vdoc.callback(cog, ctx, module, query=query)
+    elif kind.startswith("modal_"):
+        # modal payloads hold every field, or just the code
+        fields = {"code": payload} if isinstance(payload, str) else payload
+        interaction = FakeInteraction(fake_bot, user_id)
+        if kind == "modal_eval":
+            modal = fake_modal(
+                code=fields["code"],
+                build_arguments=fields.get("build_arguments", ""),
+                run_arguments=fields.get("run_arguments", ""),
+            )
+            await bot.EvalModal.on_submit(modal, interaction)
+        elif kind == "modal_cgen":
+            modal = fake_modal(
+                code=fields["code"], build_arguments=fields.get("build_arguments", "")
+            )
+            modal.full = fields.get("full", False)
+            modal.callees = fields.get("callees", False)
+            await bot.CgenModal.on_submit(modal, interaction)
+        elif kind == "modal_format":
+            await bot.FormatModal.on_submit(
+                fake_modal(code=fields["code"]), interaction
+            )
+        else:
+            raise ValueError(f"unknown kind {kind!r}")
+    else:
+        raise ValueError(f"unknown kind {kind!r}")
+
+
+def random_payload(kind: str) -> typing.Any:
+    if kind == "docs":
+        return random.choice(DOC_QUERIES)
+    if kind == "vdoc":
+        return random.choice(VDOC_QUERIES)
+    return random.choice(SNIPPETS)
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    return ordered[round((len(ordered) - 1) * fraction)]
+
+
+@dataclasses.dataclass
+class Stats:
+    latencies: dict[str, list[float]] = dataclasses.field(default_factory=dict)
+    errors: dict[str, int] = dataclasses.field(default_factory=dict)
+
+    def record(self, kind: str, latency: float, failed: bool) -> None:
+        self.latencies.setdefault(kind, []).append(latency)
+        if failed:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, elapsed: float) -> str:
+        lines = [
+            f"{'kind':<14}{'count':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        ]
+        everything: list[float] = []
+        for kind, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            lines.append(self._row(kind, latencies, self.errors.get(kind, 0), elapsed))
+        if everything:
+            lines.append(
+                self._row("total", everything, sum(self.errors.values()), elapsed)
+            )
+        return "\n".join(lines)
+
+    def _row(
+        self, kind: str, latencies: list[float], errors: int, elapsed: float
+    ) -> str:
+        ordered = sorted(latencies)
+        return f"{kind:<14}{len(ordered):>8}{errors:>8}{len(ordered) / elapsed:>9.1f}{percentile(ordered, 0.5) * 1000:>10.1f}{percentile(ordered, 0.9) * 1000:>10.1f}{percentile(ordered, 0.99) * 1000:>10.1f}{ordered[-1] * 1000:>10.1f}"
+
+
+async def timed(
+    stats: Stats, cog: bot.BaseCog, fake_bot: typing.Any, kind: str, payload: typing.Any
+) -> None:
+    started = time.perf_counter()
+    failed = False
+    try:
+        await invoke(cog, fake_bot, kind, payload)
+    except Exception:
+        failed = True
+    stats.record(kind, time.perf_counter() - started, failed)
+
+
+async def run(args: argparse.Namespace) -> None:
+    stub = StubPlayground(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        output_size=args.output_size,
+        cgen_size=args.cgen_size,
+    )
+    url = await stub.start()
+    weights = {
+        kind: float(weight)
+        for kind, _, weight in (item.partition("=") for item in args.mix.split(","))
+    }
+    async with aiohttp.ClientSession() as session:
+        fake_bot = types.SimpleNamespace(
+            v=vplayground.V(session, base_url=url), cache=None
+        )
+        cog = bot.BaseCog()
+        # keep the one-off docs load out of the first vdoc's latency
+        await cog.loaded_docs()
+        stats = Stats()
+        tasks: set[asyncio.Task[None]] = set()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        kinds, kind_weights = list(weights), list(weights.values())
+        while time.perf_counter() < deadline:
+            kind = random.choices(kinds, kind_weights)[0]
+            task = asyncio.create_task(
+                timed(stats, cog, fake_bot, kind, random_payload(kind))
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            # open loop: arrivals do not wait for earlier requests to finish
+            await asyncio.sleep(random.expovariate(args.rate))
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = time.perf_counter() - started
+    await stub.stop()
+    print(stats.report(elapsed))
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(
+                {
+                    "elapsed": elapsed,
+                    "latencies": stats.latencies,
+                    "errors": stats.errors,
+                },
+                file,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument(
+        "--mix",
+        default="eval=4,cgen=1,format=1,docs=3,vdoc=3,modal_eval=1,modal_cgen=1",
+        help="comma separated kind=weight pairs",
+    )
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency")
+    parser.add_argument("--jitter", type=float, default=0.1, help="stub latency stddev")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="stub HTTP 500 rate"
+    )
+    parser.add_argument("--output-size", type=int, default=64)
+    parser.add_argument("--cgen-size", type=int, default=200_000)
+    parser.add_argument("--json", help="also write raw latencies to this file")
+    args = parser.parse_args()
+    for item in args.mix.split(","):
+        if item.partition("=")[0] not in KINDS:
+            parser.error(f"unknown kind in --mix: {item}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
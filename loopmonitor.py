@@ -0,0 +1,115 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures event loop scheduling delay from a watchdog thread.
+
+    The watchdog schedules a callback on the loop and records how long it took
+    to run, then sends the next one ``interval`` seconds after it ran. If it
+    does not run in time, the stack of the loop thread is logged, which points
+    at whatever callback or command is holding the loop.
+
+    A block may start up to ``interval`` before a probe is sent, so probes are
+    only given ``threshold - interval`` to run, and ``interval`` is kept to at
+    most half the threshold. That way every block longer than ``threshold`` is
+    caught, not only those that happen to overlap a probe.
+    """
+
+    interval: float
+    threshold: float
+    samples: collections.deque[float]
+    stalls: int
+    last_stall: typing.Optional[str]
+
+    def __init__(
+        self, *, interval: float = 0.05, threshold: float = 0.25, samples: int = 4096
+    ) -> None:
+        self.interval = min(interval, threshold / 2)
+        self.threshold = threshold
+        self.samples = collections.deque(maxlen=samples)
+        self.stalls = 0
+        self.last_stall = None
+        self._loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: typing.Optional[int] = None
+        self._thread: typing.Optional[threading.Thread] = None
+        self._acked = threading.Event()
+        self._stopped = threading.Event()
+
+    @property
+    def lag(self) -> float:
+        """The most recent scheduling delay in seconds."""
+        return self.samples[-1] if self.samples else 0.0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._thread is not None:
+            raise RuntimeError("loop monitor is already running")
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="vbot-loop-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._acked.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def percentiles(self) -> dict[str, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {}
+        last = len(ordered) - 1
+        return {
+            "p50": ordered[round(last * 0.5)],
+            "p90": ordered[round(last * 0.9)],
+            "p99": ordered[round(last * 0.99)],
+            "max": ordered[last],
+        }
+
+    def _ack(self, sent: float) -> None:
+        self.samples.append(time.monotonic() - sent)
+        self._acked.set()
+
+    def _stack(self) -> str:
+        frame = sys._current_frames().get(typing.cast(int, self._loop_thread_id))
+        if frame is None:
+            return "<loop thread is gone>\n"
+        return "".join(traceback.format_stack(frame))
+
+    def _run(self) -> None:
+        loop = typing.cast(asyncio.AbstractEventLoop, self._loop)
+        while not self._stopped.is_set():
+            sent = time.monotonic()
+            self._acked.clear()
+            try:
+                loop.call_soon_threadsafe(self._ack, sent)
+            except RuntimeError:
+                # loop was closed under us
+                return
+            if not self._acked.wait(self.threshold - self.interval):
+                stack = self._stack()
+                self._acked.wait()
+                if self._stopped.is_set():
+                    return
+                self.stalls += 1
+                self.last_stall = stack
+                logger.warning(
+                    "Event loop was blocked for %.3fs, loop thread stack at %.3fs:\n%s",
+                    time.monotonic() - sent,
+                    self.threshold - self.interval,
+                    stack,
+                )
+            self._stopped.wait(self.interval)
@@ -0,0 +1,72 @@
+"""Local parse-only check run before sending code to the playground.
+
+Code that does not even parse fails on play.vlang.io as well, so running
+``v -check-syntax`` locally first saves the round trip. The check fails open:
+when the local compiler is missing, slow, or all workers are busy, the code is
+simply sent upstream as before.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class Preflight:
+    def __init__(self, *, v: str = "v", workers: int = 2, timeout: float = 5.0) -> None:
+        self.v = v
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(workers)
+        self.disabled = False
+        self.stats = {"checked": 0, "rejected": 0, "skipped": 0}
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of checked submissions that never had to go upstream."""
+        if self.stats["checked"] == 0:
+            return 0.0
+        return self.stats["rejected"] / self.stats["checked"]
+
+    async def check(self, code: str) -> typing.Optional[str]:
+        """Return the parse errors of ``code``, or None if it should be sent."""
+        if self.disabled or self.slots.locked():
+            self.stats["skipped"] += 1
+            return None
+        async with self.slots:
+            with tempfile.TemporaryDirectory(prefix="vbot-preflight-") as directory:
+                path = os.path.join(directory, "code.v")
+                with open(path, "w", encoding="utf_8") as file:
+                    file.write(code)
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        self.v,
+                        "-check-syntax",
+                        path,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.STDOUT,
+                    )
+                except OSError as exc:
+                    logger.warning(
+                        "Disabling preflight, cannot run %r: %s", self.v, exc
+                    )
+                    self.disabled = True
+                    self.stats["skipped"] += 1
+                    return None
+                try:
+                    output, _ = await asyncio.wait_for(
+                        process.communicate(), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+                    self.stats["skipped"] += 1
+                    return None
+        self.stats["checked"] += 1
+        if process.returncode == 0:
+            return None
+        self.stats["rejected"] += 1
+        # match the playground, which reports errors against code.v
+        return output.decode("utf_8", "replace").replace(path, "code.v").strip()
@@ -0,0 +1,82 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+import typing
+
+
+class Profiler:
+    """Runtime profiler that can be toggled on a live bot.
+
+    Nothing is installed until :meth:`start` is called, so an idle profiler
+    costs nothing.
+    """
+
+    cpu: typing.Optional[cProfile.Profile]
+    baseline: typing.Optional[tracemalloc.Snapshot]
+    started_at: typing.Optional[float]
+
+    def __init__(self) -> None:
+        self.cpu = None
+        self.baseline = None
+        self.started_at = None
+
+    @property
+    def running(self) -> bool:
+        return self.cpu is not None or self.baseline is not None
+
+    def start(self, *, cpu: bool = True, memory: bool = False) -> None:
+        if self.running:
+            raise RuntimeError("profiler is already running")
+        if cpu:
+            self.cpu = cProfile.Profile()
+            self.cpu.enable()
+        if memory:
+            tracemalloc.start()
+            self.baseline = tracemalloc.take_snapshot()
+        self.started_at = time.perf_counter()
+
+    def stop(self, limit: int = 30) -> str:
+        if not self.running:
+            raise RuntimeError("profiler is not running")
+        report = self.dump(limit)
+        if self.cpu is not None:
+            self.cpu.disable()
+            self.cpu = None
+        if self.baseline is not None:
+            tracemalloc.stop()
+            self.baseline = None
+        self.started_at = None
+        return report
+
+    def dump(self, limit: int = 30) -> str:
+        if not self.running:
+            raise RuntimeError("profiler is not running")
+        buffer = io.StringIO()
+        elapsed = time.perf_counter() - typing.cast(float, self.started_at)
+        buffer.write(f"Profiling for {elapsed:.3f}s\n\n")
+        if self.cpu is not None:
+            # snapshotting stats requires the profiler to be paused
+            self.cpu.disable()
+            try:
+                stats = pstats.Stats(self.cpu, stream=buffer)
+                stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE)
+                stats.print_stats(limit)
+            finally:
+                self.cpu.enable()
+        if self.baseline is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            buffer.write(
+                f"Traced memory: current={current / 1024:.1f} KiB, peak={peak / 1024:.1f} KiB\n"
+            )
+            buffer.write(f"Top {limit} allocation sites since start:\n")
+            for stat in snapshot.compare_to(self.baseline, "lineno")[:limit]:
+                buffer.write(f"{stat}\n")
+        return buffer.getvalue()
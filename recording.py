@@ -0,0 +1,152 @@
+"""Opt-in recording of real traffic, for replay with ``replay.py``.
+
+Each recorded invocation is appended to a JSONL file as one object:
+
+``kind``, ``payload``
+    What :func:`loadtest.invoke` takes to run the same handler again.
+``at``, ``duration``
+    Wall clock arrival time and how long the handler took, in seconds.
+``playground``
+    One entry per call to the playground made while handling it, with the
+    endpoint, a hash of the code, the latency and the size of every field of
+    the response (or ``failed``). The response text itself is not kept.
+
+Nothing about who sent the invocation, or where, is written. Like tracing,
+recording is sampled and costs a context variable lookup when it is off.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+current_entry: contextvars.ContextVar[typing.Optional[dict[str, typing.Any]]] = (
+    contextvars.ContextVar("current_entry", default=None)
+)
+
+
+def code_key(code: str) -> str:
+    return hashlib.sha256(code.encode("utf_8")).hexdigest()[:16]
+
+
+class Recorder:
+    sample_rate: float
+    file: typing.Optional[typing.TextIO]
+
+    def __init__(self) -> None:
+        self.sample_rate = 0.0
+        self.file = None
+        self.max_bytes = 0
+        self.written = 0
+
+    def open(self, path: str, *, sample_rate: float, max_bytes: int) -> None:
+        self.close()
+        # append, so an existing trace is extended rather than replaced
+        self.file = open(path, "a", encoding="utf_8")
+        self.written = os.path.getsize(path)
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        self.file = None
+        self.sample_rate = 0.0
+
+    @contextlib.contextmanager
+    def record(
+        self, kind: str, payload: typing.Callable[[], typing.Any]
+    ) -> typing.Iterator[None]:
+        """Record the invocation run inside the block, if sampled.
+
+        ``payload`` is only called for sampled invocations.
+        """
+        if self.file is None or random.random() >= self.sample_rate:
+            yield
+            return
+        entry = {
+            "kind": kind,
+            "payload": payload(),
+            "at": round(time.time(), 3),
+            "playground": [],
+        }
+        token = current_entry.set(entry)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            entry["failed"] = True
+            raise
+        finally:
+            current_entry.reset(token)
+            entry["duration"] = round(time.perf_counter() - started, 4)
+            self._write(entry)
+
+    def _write(self, entry: dict[str, typing.Any]) -> None:
+        if self.file is None:
+            return
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        size = len(line.encode("utf_8"))
+        if self.max_bytes and self.written + size > self.max_bytes:
+            logger.warning("Recording reached %d bytes, stopping", self.written)
+            self.close()
+            return
+        self.file.write(line)
+        self.file.flush()
+        self.written += size
+
+
+recorder = Recorder()
+
+
+def configure(
+    *,
+    sample_rate: float = 0.0,
+    path: str = "requests.jsonl",
+    max_bytes: int = 64 << 20,
+) -> None:
+    """Set up the global recorder from the ``recording`` section of ``config.json``."""
+    if sample_rate <= 0:
+        recorder.close()
+    else:
+        recorder.open(path, sample_rate=sample_rate, max_bytes=max_bytes)
+
+
+def record(
+    kind: str, payload: typing.Callable[[], typing.Any]
+) -> typing.ContextManager[None]:
+    return recorder.record(kind, payload)
+
+
+def playground(
+    endpoint: str,
+    fields: dict[str, str],
+    latency: float,
+    data: typing.Optional[dict[str, typing.Any]],
+) -> None:
+    """Note a playground call made by the invocation being recorded, if any.
+
+    ``data`` is None when the call failed.
+    """
+    entry = current_entry.get()
+    if entry is None:
+        return
+    call: dict[str, typing.Any] = {
+        "endpoint": endpoint,
+        "code": code_key(fields["code"]),
+        "latency": round(latency, 4),
+    }
+    if data is None:
+        call["failed"] = True
+    else:
+        call["sizes"] = {
+            name: len(value) for name, value in data.items() if isinstance(value, str)
+        }
+    entry["playground"].append(call)
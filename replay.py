@@ -0,0 +1,156 @@
+"""Replay recorded traffic against the bot's command handlers.
+
+Reads a trace the bot wrote with ``recording`` enabled in ``config.json`` and
+runs every invocation through the same handlers as ``loadtest.py``, at the
+recorded pace or faster. The playground stub answers each call with the
+latency and response sizes recorded for the same code, so performance changes
+are measured on the real query mix. Lines that are not recorded invocations
+are skipped. Run it from the bot directory, like ``loadtest.py``::
+
+    python3 replay.py requests.jsonl --speed 10
+"""
+
+import aiohttp
+import argparse
+import asyncio
+import collections
+import json
+import sys
+import time
+import types
+import typing
+import bot
+import loadtest
+import recording
+import vplayground
+
+
+class ReplayPlayground(loadtest.StubPlayground):
+    """Stub answering with what was recorded for the same endpoint and code."""
+
+    def __init__(self, entries: list[dict[str, typing.Any]]) -> None:
+        # calls that were not recorded (cache hits, preflight rejections) get
+        # an empty answer right away
+        super().__init__(latency=0.0, jitter=0.0, output_size=0, cgen_size=0)
+        self.calls: dict[tuple[str, str], collections.deque[dict[str, typing.Any]]] = {}
+        for entry in entries:
+            for call in entry["playground"]:
+                self.calls.setdefault(
+                    (call["endpoint"], call["code"]), collections.deque()
+                ).append(call)
+        self.unmatched = 0
+
+    def reply(
+        self, endpoint: str, form: typing.Mapping[str, str]
+    ) -> tuple[float, typing.Optional[dict[str, str]]]:
+        calls = self.calls.get((endpoint, recording.code_key(form.get("code", ""))))
+        if not calls:
+            self.unmatched += 1
+            return super().reply(endpoint, form)
+        call = calls.popleft()
+        if call.get("failed"):
+            return call["latency"], None
+        return call["latency"], {
+            name: "x" * size for name, size in call["sizes"].items()
+        }
+
+
+def load(path: str) -> list[dict[str, typing.Any]]:
+    entries = []
+    with open(path, "r", encoding="utf_8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if (
+                isinstance(entry, dict)
+                and entry.get("kind") in loadtest.KINDS
+                and "payload" in entry
+                and "at" in entry
+            ):
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry["at"])
+    return entries
+
+
+async def run(args: argparse.Namespace) -> int:
+    entries = load(args.path)
+    if not entries:
+        print(f"No recorded invocations in {args.path}", file=sys.stderr)
+        return 1
+    stub = ReplayPlayground(entries)
+    url = await stub.start()
+    async with aiohttp.ClientSession() as session:
+        fake_bot = types.SimpleNamespace(
+            v=vplayground.V(session, base_url=url), cache=None
+        )
+        cog = bot.BaseCog()
+        await cog.loaded_docs()
+        stats = loadtest.Stats()
+        tasks: set[asyncio.Task[None]] = set()
+        started = time.perf_counter()
+        offset = 0.0
+        previous = entries[0]["at"]
+        for entry in entries:
+            # long quiet periods (or restarts) would only make the replay idle
+            offset += min(entry["at"] - previous, args.max_gap) / args.speed
+            previous = entry["at"]
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(
+                loadtest.timed(stats, cog, fake_bot, entry["kind"], entry["payload"])
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        elapsed = time.perf_counter() - started
+    await stub.stop()
+    recorded = loadtest.Stats()
+    for entry in entries:
+        recorded.record(
+            entry["kind"], entry.get("duration", 0.0), entry.get("failed", False)
+        )
+    span = max(entries[-1]["at"] - entries[0]["at"], 1e-3)
+    print(f"recorded, {len(entries)} invocations")
+    print(recorded.report(span))
+    print(f"\nreplayed at {args.speed:g}x")
+    print(stats.report(elapsed))
+    if stub.unmatched:
+        print(f"\n{stub.unmatched} playground calls had no recorded response")
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(
+                {
+                    "elapsed": elapsed,
+                    "latencies": stats.latencies,
+                    "errors": stats.errors,
+                },
+                file,
+            )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", default="requests.jsonl")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="replay this many times faster"
+    )
+    parser.add_argument(
+        "--max-gap",
+        type=float,
+        default=5.0,
+        help="longest recorded pause to keep, in seconds",
+    )
+    parser.add_argument("--json", help="also write raw latencies to this file")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
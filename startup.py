@@ -0,0 +1,58 @@
+"""Timing of the bot's startup phases.
+
+Import this module before anything else so the clock starts as early as
+possible. Phases may overlap (deferred ones run after the gateway connection),
+so each is recorded with its own start offset rather than as a sequence.
+"""
+
+import contextlib
+import time
+import typing
+
+STARTED = time.perf_counter()
+
+
+class Timeline:
+    phases: list[tuple[str, float, float]]
+    ready: typing.Optional[float]
+    first_reply: typing.Optional[float]
+
+    def __init__(self, started: float = STARTED) -> None:
+        self.started = started
+        self.phases = []
+        self.ready = None
+        self.first_reply = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, name: str, begin: float) -> None:
+        """Record a phase that began at ``begin`` and ends now."""
+        end = time.perf_counter()
+        self.phases.append((name, begin - self.started, end - begin))
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, begin)
+
+    def mark_ready(self) -> None:
+        if self.ready is None:
+            self.ready = self.elapsed()
+
+    def mark_reply(self) -> None:
+        if self.first_reply is None:
+            self.first_reply = self.elapsed()
+
+    def report(self) -> str:
+        lines = [
+            f"{name:<16} +{offset * 1000:8.1f} ms  {duration * 1000:8.1f} ms"
+            for name, offset, duration in self.phases
+        ]
+        for name, value in (("ready", self.ready), ("first reply", self.first_reply)):
+            shown = "-" if value is None else f"{value * 1000:.1f} ms"
+            lines.append(f"{name:<16} {shown}")
+        return "\n".join(lines)
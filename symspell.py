@@ -0,0 +1,80 @@
+"""Symmetric delete lookup for names within a small edit distance.
+
+Every word is indexed under all strings obtained by deleting up to
+``max_distance`` characters from its first ``prefix_length`` characters. A
+query generates the same deletes, so every word within ``max_distance`` edits
+shares at least one key with it and candidates are found with a handful of
+hash lookups instead of a scan over every word. The exact distance is only
+computed for those candidates, to rank them.
+"""
+
+import sys
+import time
+import typing
+
+
+def deletes(word: str, max_distance: int) -> set[str]:
+    found = {word}
+    frontier = [word]
+    for _ in range(max_distance):
+        following = []
+        for item in frontier:
+            for i in range(len(item)):
+                variant = item[:i] + item[i + 1 :]
+                if variant not in found:
+                    found.add(variant)
+                    following.append(variant)
+        frontier = following
+    return found
+
+
+class SymSpell:
+    words: list[str]
+    max_distance: int
+    prefix_length: int
+    build_time: float
+
+    def __init__(
+        self,
+        words: typing.Iterable[str],
+        distance: typing.Callable[[str, str], int],
+        *,
+        max_distance: int = 2,
+        prefix_length: int = 7,
+    ) -> None:
+        started = time.perf_counter()
+        self.words = list(words)
+        self.distance = distance
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.index: dict[str, list[int]] = {}
+        for i, word in enumerate(self.words):
+            for variant in deletes(word[:prefix_length], max_distance):
+                self.index.setdefault(variant, []).append(i)
+        self.build_time = time.perf_counter() - started
+
+    def lookup(self, query: str) -> list[tuple[int, int]]:
+        """Return ``(distance, index)`` of words within ``max_distance``.
+
+        Results are sorted by distance, then by position in ``words``.
+        """
+        candidates: set[int] = set()
+        for variant in deletes(query[: self.prefix_length], self.max_distance):
+            candidates.update(self.index.get(variant, ()))
+        results = []
+        for i in candidates:
+            word = self.words[i]
+            if abs(len(word) - len(query)) > self.max_distance:
+                continue
+            score = self.distance(query, word)
+            if score <= self.max_distance:
+                results.append((score, i))
+        results.sort()
+        return results
+
+    def memory(self) -> int:
+        """Approximate bytes held by the index, not counting ``words``."""
+        total = sys.getsizeof(self.index)
+        for key, value in self.index.items():
+            total += sys.getsizeof(key) + sys.getsizeof(value)
+        return total
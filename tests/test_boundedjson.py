@@ -0,0 +1,90 @@
+import json
+import random
+import re
+import typing
+import boundedjson
+
+ALPHABET = ["a", " ", '"', "\\", "\n", "\t", "\x01", "/", "é", "€", "😀", "u", "0"]
+MARKER = re.compile(r"\n\.\.\. \[(\d+) bytes truncated\] \.\.\.\n")
+
+
+def decode(body: bytes, limit: int, rng: random.Random) -> boundedjson.Decoder:
+    decoder = boundedjson.Decoder(limit)
+    i = 0
+    while i < len(body):
+        step = rng.randint(1, 16)
+        decoder.feed(body[i : i + step])
+        i += step
+    return decoder
+
+
+def text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def dumps(value: typing.Any, rng: random.Random) -> bytes:
+    return json.dumps(value, ensure_ascii=rng.random() < 0.5).encode("utf_8")
+
+
+def test_small_objects_decode_like_json() -> None:
+    rng = random.Random(1)
+    for _ in range(2000):
+        value = {
+            "output": text(rng, rng.randint(0, 80)),
+            'build"Output': text(rng, rng.randint(0, 20)),
+            "error": "",
+            "other": rng.choice([1, -2.5e3, True, None, [1, "a\\"], {"b": [2]}]),
+        }
+        body = json.dumps(
+            value, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1])
+        ).encode("utf_8")
+        decoder = decode(body, 1 << 20, rng)
+        assert decoder.close() == value
+        assert decoder.truncated == []
+
+
+def test_truncated_fields_keep_exact_head_and_tail() -> None:
+    rng = random.Random(2)
+    for _ in range(2000):
+        original = text(rng, rng.randint(50, 400))
+        limit = rng.randint(0, 600)
+        decoder = decode(dumps({"output": original, "error": ""}, rng), limit, rng)
+        result = decoder.close()
+        output = result["output"]
+        output.encode("utf_8")
+        if decoder.truncated == []:
+            assert output == original
+            continue
+        assert decoder.truncated == ["output"]
+        head, omitted, tail = MARKER.split(output)
+        assert original.startswith(head)
+        assert original.endswith(tail)
+        assert len(head) + len(tail) < len(original)
+        assert int(omitted) > 0
+
+
+def test_cuts_inside_surrogate_pairs_and_escapes() -> None:
+    rng = random.Random(3)
+    for original in ["😀" * 1000, "€" * 1000, "\\n" * 1000, "\x01" * 1000]:
+        for limit in range(3990, 4010):
+            body = json.dumps({"output": original}).encode("utf_8")
+            decoder = decode(body, limit, rng)
+            output = decoder.close()["output"]
+            output.encode("utf_8")
+            head, _, tail = MARKER.split(output)
+            assert original.startswith(head) and original.endswith(tail)
+
+
+def test_field_never_holds_more_than_its_limit() -> None:
+    rng = random.Random(4)
+    for _ in range(500):
+        limit = rng.randint(0, 200)
+        field = boundedjson.Field(limit)
+        raw = json.dumps(text(rng, 1000)).encode("utf_8")[1:-1]
+        i = 0
+        while i < len(raw):
+            step = rng.randint(1, 32)
+            field.add(raw[i : i + step])
+            i += step
+            assert len(field.head) + len(field.tail) <= max(limit, boundedjson.SLACK)
+        field.value().encode("utf_8")
@@ -0,0 +1,187 @@
+import aiohttp
+from aiohttp import web
+import asyncio
+import typing
+import cache
+import vplayground
+
+
+class StandIn:
+    """In-process server speaking just the RESP2 commands the cache sends."""
+
+    def __init__(self) -> None:
+        self.data: dict[bytes, bytes] = {}
+        self.commands: list[list[bytes]] = []
+        self.down = False
+        self.server: typing.Optional[asyncio.Server] = None
+        self.port = 0
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while not self.down:
+                header = await reader.readuntil(b"\r\n")
+                command = []
+                for _ in range(int(header[1:-2])):
+                    size = await reader.readuntil(b"\r\n")
+                    command.append((await reader.readexactly(int(size[1:-2]) + 2))[:-2])
+                self.commands.append(command)
+                writer.write(self.reply(command))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def reply(self, command: list[bytes]) -> bytes:
+        name = command[0].upper()
+        if name == b"MGET":
+            parts = [b"*%d\r\n" % (len(command) - 1)]
+            for key in command[1:]:
+                value = self.data.get(key)
+                if value is None:
+                    parts.append(b"$-1\r\n")
+                else:
+                    parts.append(b"$%d\r\n%s\r\n" % (len(value), value))
+            return b"".join(parts)
+        if name == b"SET":
+            self.data[command[1]] = command[2]
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    def count(self, name: bytes) -> int:
+        return sum(1 for command in self.commands if command[0] == name)
+
+
+def test_values_are_shared_through_the_server() -> None:
+    async def main() -> None:
+        server = StandIn()
+        url = await server.start()
+        try:
+            writer = cache.Cache(redis=url)
+            await writer.set_many({"a": {"x": 1}, "b": [2]}, 60)
+            assert server.count(b"SET") == 2
+            assert all(command[3:] == [b"EX", b"60"] for command in server.commands)
+            reader = cache.Cache(redis=url)
+            assert await reader.get_many(["a", "b", "c"]) == [{"x": 1}, [2], None]
+            assert server.count(b"MGET") == 1
+            assert reader.stats["remote_hits"] == 2
+            assert reader.stats["misses"] == 1
+            # now answered from the local tier
+            assert await reader.get("a") == {"x": 1}
+            assert server.count(b"MGET") == 1
+        finally:
+            await server.stop()
+
+    asyncio.run(main())
+
+
+def test_falls_back_to_local_cache_and_retries_later() -> None:
+    async def main() -> None:
+        server = StandIn()
+        server.down = True
+        url = await server.start()
+        try:
+            shared = cache.Cache(redis=url, retry_after=0.2)
+            assert await shared.get("a") is None
+            assert shared.stats["errors"] == 1
+            await shared.set("a", 1, 60)
+            assert await shared.get("a") == 1
+            # the server is left alone until retry_after has passed
+            server.down = False
+            assert await shared.get("b") is None
+            await shared.set("b", 2, 60)
+            assert shared.stats["errors"] == 1
+            assert server.commands == []
+            await asyncio.sleep(0.25)
+            await shared.set("c", 3, 60)
+            assert server.data == {b"vbot:c": b"3"}
+        finally:
+            await server.stop()
+
+    asyncio.run(main())
+
+
+class Garbled(StandIn):
+    def reply(self, command: list[bytes]) -> bytes:
+        return b"*many\r\n"
+
+
+def test_bad_values_and_replies_are_misses() -> None:
+    async def main() -> None:
+        server = StandIn()
+        server.data[b"vbot:a"] = b"{not json"
+        server.data[b"vbot:b"] = b"\xff"
+        url = await server.start()
+        garbled = Garbled()
+        garbled_url = await garbled.start()
+        try:
+            shared = cache.Cache(redis=url)
+            assert await shared.get_many(["a", "b"]) == [None, None]
+            assert shared.stats["misses"] == 2
+            assert shared.stats["errors"] == 0
+            confused = cache.Cache(redis=garbled_url)
+            assert await confused.get("a") is None
+            assert confused.stats["errors"] == 1
+        finally:
+            await server.stop()
+            await garbled.stop()
+
+    asyncio.run(main())
+
+
+def test_only_format_and_cgen_are_cached_by_default() -> None:
+    async def main() -> None:
+        hits: list[str] = []
+
+        async def handle(request: web.Request) -> web.Response:
+            hits.append(request.path)
+            return web.json_response(
+                {"output": "", "buildOutput": "", "cgenCode": "", "error": ""}
+            )
+
+        app = web.Application()
+        app.router.add_post("/{endpoint}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        try:
+            async with aiohttp.ClientSession() as session:
+                v = vplayground.V(
+                    session, base_url=f"http://{host}:{port}", cache=cache.Cache()
+                )
+                for _ in range(2):
+                    await v.run("println(1)")
+                    await v.run_many(["println(2)"])
+                    await v.format("println(3)")
+                    await v.cgen("println(4)")
+                assert sorted(hits) == [
+                    "/cgen",
+                    "/format",
+                    "/run",
+                    "/run",
+                    "/run",
+                    "/run",
+                ]
+                v.cache_runs = True
+                hits.clear()
+                for _ in range(2):
+                    await v.run("println(5)")
+                assert hits == ["/run"]
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
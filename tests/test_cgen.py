@@ -0,0 +1,90 @@
+import cgen
+
+BUILTIN = """\
+#include <stdio.h>
+
+typedef struct string string;
+struct string {
+	u8* str;
+	int len;
+};
+
+void println(string s);
+void println(string s) {
+	puts("{");
+}
+"""
+
+
+def test_keeps_only_the_user_module() -> None:
+    code = BUILTIN + """\
+void main__greet(string name);
+int domain__count = 0;
+
+void main__greet(string name) {
+	println(name);
+}
+
+void main__main(void) {
+	main__greet(_SLIT("hi"));
+}
+"""
+    trimmed = cgen.trim(code)
+    assert trimmed == (
+        "void main__greet(string name) {\n\tprintln(name);\n}\n\n"
+        'void main__main(void) {\n\tmain__greet(_SLIT("hi"));\n}'
+    )
+
+
+def test_braces_in_literals_and_comments_are_ignored() -> None:
+    code = BUILTIN + """\
+/* unbalanced { in a comment
+   spanning } } lines { */
+char builtin__open = '{';
+void main__main(void) { // }
+	printf("}}}");
+	/* } */ putchar('}');
+}
+
+int main__after = 1;
+"""
+    trimmed = cgen.trim(code)
+    assert trimmed.startswith("void main__main(void) {")
+    assert trimmed.endswith("int main__after = 1;")
+    assert "builtin__open" not in trimmed
+
+
+def test_multi_line_define_is_one_declaration() -> None:
+    code = """\
+#define main__TWICE(x) \\
+	((x) + \\
+	(x))
+int builtin__unrelated = 0;
+void main__main(void) {
+	main__TWICE(1);
+}
+"""
+    trimmed = cgen.trim(code)
+    assert trimmed.startswith("#define main__TWICE(x) \\\n\t((x) + \\\n\t(x))\n\n")
+    assert "builtin__unrelated" not in trimmed
+
+
+def test_callees_adds_referenced_definitions() -> None:
+    code = BUILTIN + """\
+void main__main(void) {
+	println(_SLIT("hi"));
+}
+"""
+    assert "void println(string s) {" not in cgen.trim(code)
+    trimmed = cgen.trim(code, callees=True)
+    assert "void println(string s) {" in trimmed
+    assert "void println(string s);" not in trimmed
+    assert "#include" not in trimmed
+
+
+def test_nothing_found_falls_back_to_the_whole_file() -> None:
+    assert cgen.trim(BUILTIN) == ""
+    # an unterminated comment or lost entry point is not trusted either
+    assert cgen.trim(BUILTIN + "/* {\nvoid main__main(void) {\n}\n") == ""
+    assert cgen.trim("void f(void) {\n\nvoid main__main(void) {\n}\n") == ""
+    assert cgen.trim("int builtin__x = 1\nvoid main__main(void) {\n}\n") == ""
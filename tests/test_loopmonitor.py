@@ -0,0 +1,36 @@
+import asyncio
+import time
+import loopmonitor
+
+
+def test_every_block_over_threshold_is_a_stall() -> None:
+    async def main() -> loopmonitor.LoopMonitor:
+        monitor = loopmonitor.LoopMonitor(threshold=0.25)
+        monitor.start(asyncio.get_running_loop())
+        try:
+            for _ in range(10):
+                time.sleep(0.35)
+                # let the probe queued during the block run
+                await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+        return monitor
+
+    assert asyncio.run(main()).stalls == 10
+
+
+def test_short_blocks_are_not_stalls() -> None:
+    async def main() -> loopmonitor.LoopMonitor:
+        monitor = loopmonitor.LoopMonitor(threshold=0.25)
+        monitor.start(asyncio.get_running_loop())
+        try:
+            for _ in range(5):
+                time.sleep(0.05)
+                await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(main())
+    assert monitor.stalls == 0
+    assert monitor.samples
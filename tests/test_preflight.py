@@ -0,0 +1,30 @@
+import asyncio
+import typing
+import vplayground
+
+
+class Rejecting:
+    async def check(self, code: str) -> typing.Optional[str]:
+        return "code.v:1:1: error: unexpected token"
+
+
+class Playground(vplayground.V):
+    async def _fetch(self, endpoint: str, fields: dict[str, str]) -> typing.Any:
+        return {"output": "upstream", "buildOutput": "", "error": ""}
+
+
+def make() -> Playground:
+    return Playground(typing.cast(typing.Any, None), preflight=Rejecting())
+
+
+def test_parse_errors_are_answered_locally() -> None:
+    response = asyncio.run(make().run("__global x = 1"))
+    assert response.error == "code.v:1:1: error: unexpected token"
+
+
+def test_code_with_build_arguments_is_sent_upstream() -> None:
+    response = asyncio.run(
+        make().run("__global x = 1", build_arguments="-enable-globals")
+    )
+    assert response.output == "upstream"
+    assert response.error == ""
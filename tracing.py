@@ -0,0 +1,260 @@
+"""Lightweight span tracing with context propagated through ``contextvars``.
+
+Spans are opened with :func:`span`. The sampling decision is made once per
+trace when the root span is opened; unsampled traces only pay for a context
+variable lookup. Finished spans are handed to an exporter, either a rotating
+JSONL file or an OTLP/HTTP collector on the local machine.
+"""
+
+import aiohttp
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import random
+import secrets
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str
+    name: str
+    start_ns: int
+    end_ns: int
+    attributes: dict[str, typing.Any]
+    error: str
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str,
+        attributes: dict[str, typing.Any],
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error = ""
+
+    def set(self, key: str, value: typing.Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def __repr__(self) -> str:
+        return f"<Span name={self.name!r} trace_id={self.trace_id!r} span_id={self.span_id!r}>"
+
+
+class Exporter(typing.Protocol):
+    def export(self, span: Span) -> None: ...
+
+
+class JsonlExporter:
+    """Appends one JSON object per span to a size-rotated file."""
+
+    def __init__(
+        self,
+        path: str = "traces.jsonl",
+        *,
+        max_bytes: int = 16 << 20,
+        backup_count: int = 3,
+    ) -> None:
+        self.handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf_8"
+        )
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def export(self, span: Span) -> None:
+        self.handler.emit(
+            logging.makeLogRecord(
+                {
+                    "msg": json.dumps(span.to_dict(), default=str),
+                    "levelno": logging.INFO,
+                }
+            )
+        )
+
+
+class OtlpExporter:
+    """Batches spans and posts them to an OTLP/HTTP JSON endpoint."""
+
+    def __init__(
+        self,
+        endpoint: str = "http://127.0.0.1:4318/v1/traces",
+        *,
+        service_name: str = "vbot",
+        interval: float = 5.0,
+        batch_size: int = 512,
+    ) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pending: list[Span] = []
+        self.session: typing.Optional[aiohttp.ClientSession] = None
+        self.flusher: typing.Optional[asyncio.Task[None]] = None
+
+    def export(self, span: Span) -> None:
+        if len(self.pending) >= self.batch_size * 4:
+            # collector is not keeping up, drop rather than grow forever
+            return
+        self.pending.append(span)
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        while self.pending:
+            batch, self.pending = (
+                self.pending[: self.batch_size],
+                self.pending[self.batch_size :],
+            )
+            await self._post(batch)
+
+    async def _post(self, batch: list[Span]) -> None:
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "vbot"},
+                            "spans": [self._otlp_span(span) for span in batch],
+                        }
+                    ],
+                }
+            ]
+        }
+        try:
+            async with self.session.post(self.endpoint, json=payload) as response:
+                response.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logger.debug("Dropped %d spans: %s", len(batch), exc)
+
+    @staticmethod
+    def _otlp_span(span: Span) -> dict[str, typing.Any]:
+        return {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+
+
+# False marks a trace that was not sampled, so its children are skipped too
+current_span: contextvars.ContextVar[typing.Union[Span, bool, None]] = (
+    contextvars.ContextVar("current_span", default=None)
+)
+
+
+class Tracer:
+    sample_rate: float
+    exporter: typing.Optional[Exporter]
+
+    def __init__(
+        self, *, sample_rate: float = 0.0, exporter: typing.Optional[Exporter] = None
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @contextlib.contextmanager
+    def span(
+        self, name: str, **attributes: typing.Any
+    ) -> typing.Iterator[typing.Optional[Span]]:
+        parent = current_span.get()
+        if parent is False or self.exporter is None:
+            yield None
+            return
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                token = current_span.set(False)
+                try:
+                    yield None
+                finally:
+                    current_span.reset(token)
+                return
+            span = Span(name, secrets.token_hex(16), "", attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = repr(exc)
+            raise
+        finally:
+            current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.exporter.export(span)
+
+
+tracer = Tracer()
+
+
+def configure(
+    *,
+    sample_rate: float = 0.0,
+    exporter: str = "jsonl",
+    path: str = "traces.jsonl",
+    max_bytes: int = 16 << 20,
+    backup_count: int = 3,
+    endpoint: str = "http://127.0.0.1:4318/v1/traces",
+) -> None:
+    """Set up the global tracer from the ``tracing`` section of ``config.json``."""
+    if sample_rate <= 0:
+        tracer.exporter = None
+    elif exporter == "otlp":
+        tracer.exporter = OtlpExporter(endpoint)
+    elif exporter == "jsonl":
+        tracer.exporter = JsonlExporter(
+            path, max_bytes=max_bytes, backup_count=backup_count
+        )
+    else:
+        raise ValueError(f"unknown tracing exporter {exporter!r}")
+    tracer.sample_rate = sample_rate
+
+
+def span(
+    name: str, **attributes: typing.Any
+) -> typing.ContextManager[typing.Optional[Span]]:
+    """Open a span on the global tracer."""
+    return tracer.span(name, **attributes)
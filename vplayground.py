@@ -1,16 +1,27 @@
 import aiohttp
-from typing import Any
+import asyncio
+import boundedjson
+from cache import Cache
+import hashlib
+import json
+from preflight import Preflight
+import recording
+import time
+import tracing
+from typing import Any, Optional, Union
 
 
 class VRunResponse:
     output: str
     build_output: str
     error: str
+    truncated: list[str]
 
     def __init__(self, data: Any) -> None:
         self.output = data["output"]
         self.build_output = data["buildOutput"]
         self.error = data["error"]
+        self.truncated = data.get("truncated", [])
 
     def __repr__(self) -> str:
         return f"<VRunResponse output={self.output!r} build_output={self.build_output!r} error={self.error!r}>"
@@ -19,10 +30,12 @@ class VRunResponse:
 class CgenResponse:
     cgen_code: str
     error: str
+    truncated: list[str]
 
     def __init__(self, data: Any) -> None:
         self.cgen_code = data["cgenCode"]
         self.error = data["error"]
+        self.truncated = data.get("truncated", [])
 
     def __repr__(self) -> str:
         return f"<CgenResponse cgen_code={self.cgen_code!r} error={self.error!r}>"
@@ -31,10 +44,12 @@ class CgenResponse:
 class VFormatResponse:
     error: str
     output: str
+    truncated: list[str]
 
     def __init__(self, data: Any) -> None:
         self.error = data["error"]
         self.output = data["output"]
+        self.truncated = data.get("truncated", [])
 
     def __repr__(self) -> str:
         return f"<VFormatResponse error={self.error!r} output={self.output!r}>"
@@ -42,9 +57,119 @@ class VFormatResponse:
 
 class V:
     session: aiohttp.ClientSession
-
-    def __init__(self, session: aiohttp.ClientSession) -> None:
+    base_url: str
+    cache: Optional[Cache]
+    cache_ttl: float
+    cache_runs: bool
+    preflight: Optional[Preflight]
+    max_response_bytes: int
+    in_flight: int
+    waiting: int
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        base_url: str = "https://play.vlang.io",
+        cache: Optional[Cache] = None,
+        cache_ttl: float = 300.0,
+        cache_runs: bool = False,
+        max_concurrency: int = 32,
+        preflight: Optional[Preflight] = None,
+        max_response_bytes: int = 4 << 20,
+    ) -> None:
         self.session = session
+        self.base_url = base_url
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.cache_runs = cache_runs
+        self.preflight = preflight
+        self.max_response_bytes = max_response_bytes
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+
+    @staticmethod
+    def _cache_key(endpoint: str, fields: dict[str, str]) -> str:
+        digest = hashlib.sha256(
+            json.dumps([endpoint, fields], sort_keys=True).encode("utf_8")
+        ).hexdigest()
+        return f"playground:{endpoint}:{digest}"
+
+    async def _fetch(self, endpoint: str, fields: dict[str, str]) -> Any:
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        data = None
+        try:
+            async with self.session.post(
+                self.base_url + "/" + endpoint, data=aiohttp.FormData(fields)
+            ) as response:
+                response.raise_for_status()
+                with tracing.span("playground.decode"):
+                    decoder = boundedjson.Decoder(self.max_response_bytes)
+                    async for chunk in response.content.iter_chunked(1 << 16):
+                        decoder.feed(chunk)
+                    data = decoder.close()
+                    if decoder.truncated:
+                        # kept in the data so cached responses stay marked
+                        data["truncated"] = decoder.truncated
+                    return data
+        finally:
+            recording.playground(endpoint, fields, time.perf_counter() - started, data)
+            self.in_flight -= 1
+            self.slots.release()
+
+    async def _compile(self, endpoint: str, fields: dict[str, str]) -> Any:
+        """Fetch from the playground unless the code fails to parse locally.
+
+        Code with build arguments is always sent, flags such as
+        ``-enable-globals`` change what parses.
+        """
+        if (
+            self.preflight is not None
+            and endpoint != "format"
+            and not fields.get("build-arguments", "").strip()
+        ):
+            with tracing.span("playground.preflight"):
+                error = await self.preflight.check(fields["code"])
+            if error is not None:
+                if endpoint == "cgen":
+                    return {"cgenCode": "", "error": error}
+                return {"output": "", "buildOutput": "", "error": error}
+        return await self._fetch(endpoint, fields)
+
+    def _cache_for(self, endpoint: str) -> Optional[Cache]:
+        # programs may print random numbers or the time, so running them is
+        # only cached when asked for
+        if endpoint.startswith("run") and not self.cache_runs:
+            return None
+        return self.cache
+
+    async def _post(self, endpoint: str, fields: dict[str, str]) -> Any:
+        cache = self._cache_for(endpoint)
+        if cache is None:
+            return await self._compile(endpoint, fields)
+        key = self._cache_key(endpoint, fields)
+        data = await cache.get(key)
+        if data is None:
+            data = await self._compile(endpoint, fields)
+            await cache.set(key, data, self.cache_ttl)
+        return data
+
+    @staticmethod
+    def _run_fields(
+        code: str, build_arguments: str, run_arguments: str
+    ) -> dict[str, str]:
+        return {
+            "code": code,
+            "build-arguments": build_arguments,
+            "run-arguments": run_arguments,
+        }
 
     async def run(
         self,
@@ -54,36 +179,59 @@ class V:
         build_arguments: str = "",
         run_arguments: str = "",
     ) -> VRunResponse:
-        async with self.session.post(
-            "https://play.vlang.io/run" + ("_test" if test else ""),
-            data=aiohttp.FormData(
-                {
-                    "code": code,
-                    "build-arguments": build_arguments,
-                    "run-arguments": run_arguments,
-                }
-            ),
-        ) as response:
-            response.raise_for_status()
-            return VRunResponse(await response.json())
+        with tracing.span("playground.run", code_length=len(code)):
+            return VRunResponse(
+                await self._post(
+                    "run" + ("_test" if test else ""),
+                    self._run_fields(code, build_arguments, run_arguments),
+                )
+            )
+
+    async def run_many(
+        self,
+        codes: list[str],
+        *,
+        test: bool = False,
+        build_arguments: str = "",
+        run_arguments: str = "",
+    ) -> list[Union[VRunResponse, BaseException]]:
+        """Run several programs concurrently.
+
+        Cached results are looked up in one go, and failures are returned in
+        place of their response instead of being raised.
+        """
+        endpoint = "run" + ("_test" if test else "")
+        fields = [
+            self._run_fields(code, build_arguments, run_arguments) for code in codes
+        ]
+        keys = [self._cache_key(endpoint, item) for item in fields]
+        cache = self._cache_for(endpoint)
+        if cache is not None:
+            cached = await cache.get_many(keys)
+        else:
+            cached = [None] * len(codes)
+
+        async def run_one(item: dict[str, str], key: str, data: Any) -> VRunResponse:
+            with tracing.span("playground.run", code_length=len(item["code"])):
+                if data is None:
+                    data = await self._compile(endpoint, item)
+                    if cache is not None:
+                        await cache.set(key, data, self.cache_ttl)
+                return VRunResponse(data)
+
+        return await asyncio.gather(
+            *(run_one(*args) for args in zip(fields, keys, cached)),
+            return_exceptions=True,
+        )
 
     async def cgen(self, code: str, *, build_arguments: str = "") -> CgenResponse:
-        async with self.session.post(
-            "https://play.vlang.io/cgen",
-            data=aiohttp.FormData(
-                {
-                    "code": code,
-                    "build-arguments": build_arguments,
-                }
-            ),
-        ) as response:
-            response.raise_for_status()
-            return CgenResponse(await response.json())
+        with tracing.span("playground.cgen", code_length=len(code)):
+            return CgenResponse(
+                await self._post(
+                    "cgen", {"code": code, "build-arguments": build_arguments}
+                )
+            )
 
     async def format(self, code: str) -> VFormatResponse:
-        async with self.session.post(
-            "https://play.vlang.io/format",
-            data=aiohttp.FormData({"code": code}),
-        ) as response:
-            response.raise_for_status()
-            return VFormatResponse(await response.json())
+        with tracing.span("playground.format", code_length=len(code)):
+            return VFormatResponse(await self._post("format", {"code": code}))